@@ -0,0 +1,70 @@
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import SCRIPT, write_ledger
+
+WORKLOAD = [
+    ['report', 'monthly', '--month', '1', '--year', '2025'],
+    ['list', '--category', 'Groceries', '--start-date', '2025-01-01', '--end-date', '2025-01-07'],
+    ['add', 'expense', '--amount', '12.5', '--category', 'Groceries', '--date', '2025-01-03'],
+    ['report', 'category', '--year', '2025', '--month', '1'],
+    ['budget', 'status', '--month', '1', '--year', '2025'],
+]
+
+
+def run_processes(data_dir:Path, requests:int, extra:list) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        argv = [sys.executable, str(SCRIPT), '--data-dir', str(data_dir)] + extra + WORKLOAD[i % len(WORKLOAD)]
+        subprocess.run(argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return requests / (time.perf_counter() - start)
+
+
+def run_socket(socket_path:Path, requests:int) -> float:
+    start = time.perf_counter()
+    for i in range(requests):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(str(socket_path))
+            sock.sendall(json.dumps({'argv': WORKLOAD[i % len(WORKLOAD)], 'cwd': os.getcwd()}).encode() + b'\n')
+            reply = json.loads(sock.makefile('rb').readline())
+            assert reply['status'] == 0, reply
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Requests per second: one process per command versus the serve daemon')
+    parser.add_argument('--size', type=int, default=100_000, help='Number of synthetic transactions')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per mode')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        write_ledger(data_dir, args.size)
+
+        print(f'{args.size} transactions, {args.requests} requests per mode, mixed add/list/report/budget workload')
+        print(f"{'mode':<28}{'requests/s':>12}")
+        print(f"{'process per command':<28}{run_processes(data_dir, args.requests, ['--no-daemon']):>12.1f}")
+
+        socket_path = data_dir / 'tracker.sock'
+        daemon = subprocess.Popen([sys.executable, str(SCRIPT), '--data-dir', str(data_dir), 'serve'],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            while not socket_path.exists():
+                time.sleep(0.05)
+
+            print(f"{'CLI forwarded to daemon':<28}{run_processes(data_dir, args.requests, []):>12.1f}")
+            print(f"{'raw socket to daemon':<28}{run_socket(socket_path, args.requests * 10):>12.1f}")
+        finally:
+            daemon.terminate()
+            daemon.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+import argparse
+import contextlib
+import gc
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from suite import load_tracker, EXPENSE_CATEGORIES, INCOME_CATEGORIES, YEARS
+from synthetic import write_ledger
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling of the parallel scan (contiguous row slices, one per process) behind report range / rebuild-aggregates')
+    parser.add_argument('--size', type=int, default=1_000_000, help='Transactions in the synthetic ledger')
+    parser.add_argument('--runs', type=int, default=3, help='Timed runs per worker count')
+    parser.add_argument('--workers', type=int, nargs='+', help='Worker counts to try (default: 1, 2, 4, ... up to the CPU count)')
+    parser.add_argument('--backend', choices=['json', 'sqlite', 'binary'], default='json', help='Storage backend to measure')
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, cpus} | {2 ** n for n in range(1, cpus.bit_length()) if 2 ** n <= cpus})
+
+    module = load_tracker()
+    tracker_parser = module.build_parser()
+    first_year = 2026 - YEARS
+    argv = ['report', 'range', '--from-year', str(first_year), '--to-year', '2025', '--monthly']
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        write_ledger(data_dir, args.size, expense_categories=EXPENSE_CATEGORIES, income_categories=INCOME_CATEGORIES, years=YEARS)
+
+        if args.backend != 'json':
+            migrate = tracker_parser.parse_args(['migrate', '--to', args.backend])
+            with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+                migrate.func(module.FinanceTracker(base_dir=data_dir), migrate)
+
+        tracker = module.FinanceTracker(base_dir=data_dir, backend=args.backend, cache_size=0)
+        # the ledger stays loaded, like in the daemon: only the scan is timed, not reading the file
+        tracker.storage.load()
+
+        print(f'{args.size} transactions over {YEARS} years, {args.backend} backend, {cpus} CPUs, {args.runs} runs')
+        print(f"{'workers':>8}{'min ms':>10}{'median ms':>12}{'speedup':>10}")
+
+        baseline = None
+        outputs = set()
+        for n in workers:
+            args_n = tracker_parser.parse_args(argv + ['--workers', str(n)])
+            timings = []
+            for _ in range(args.runs):
+                # stale aggregates force the full partitioned scan
+                tracker.rollup.FILE.unlink(missing_ok=True)
+                tracker.rollup.reload()
+                gc.collect()
+                with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+                    start = time.perf_counter()
+                    args_n.func(tracker, args_n)
+                    timings.append((time.perf_counter() - start) * 1000)
+
+            with tempfile.TemporaryFile('w+') as out, contextlib.redirect_stdout(out):
+                args_n.func(tracker, args_n)
+                out.seek(0)
+                outputs.add(out.read())
+
+            median = statistics.median(timings)
+            baseline = baseline or median
+            print(f'{n:>8}{min(timings):>10.1f}{median:>12.1f}{baseline / median:>9.2f}x')
+
+        print('output identical for every worker count' if len(outputs) == 1 else 'OUTPUT DIFFERS between worker counts')
+
+
+if __name__ == '__main__':
+    main()
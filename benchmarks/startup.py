@@ -0,0 +1,64 @@
+import argparse
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic import SCRIPT, write_ledger
+
+
+def commands(out_dir:Path):
+    return {
+        'help': ['--help'],
+        'add expense': ['add', 'expense', '--amount', '12.5', '--category', 'Groceries', '--date', '2025-01-03'],
+        'add income': ['add', 'income', '--amount', '2000', '--category', 'Salary', '--date', '2025-01-05'],
+        'list': ['list', '--category', 'Groceries', '--month', 1, '--year', 2025],
+        'report monthly': ['report', 'monthly', '--month', 1, '--year', 2025],
+        'report yearly': ['report', 'yearly', '--year', 2025],
+        'report category': ['report', 'category', '--year', 2025],
+        'budget set': ['budget', 'set', '--category', 'Dining', '--limit', '150', '--month', 1],
+        'budget status': ['budget', 'status', '--month', 1, '--year', 2025],
+        'export': ['export', '--format', 'csv', '--type', 'expense', '--year', 2025, '--file-name', '{run}.csv', '--file-path', str(out_dir)],
+    }
+
+
+def time_command(data_dir:Path, backend:str, argv:list, run:int) -> float:
+    # without the result cache, every run after the first would only time a cache hit
+    cmd = [sys.executable, str(SCRIPT), '--data-dir', str(data_dir), '--backend', backend, '--cache-size', '0']
+    cmd += [str(a).format(run=run) for a in argv]
+
+    start = time.perf_counter()
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start latency of every finance tracker subcommand')
+    parser.add_argument('--size', type=int, default=100_000, help='Number of synthetic transactions')
+    parser.add_argument('--runs', type=int, default=5, help='Process launches per command')
+    parser.add_argument('--backend', choices=['json', 'sqlite', 'binary'], default='json', help='Storage backend to measure')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp) / 'ledger'
+        out_dir = Path(tmp) / 'exports'
+        data_dir.mkdir()
+        out_dir.mkdir()
+
+        write_ledger(data_dir, args.size)
+        if args.backend != 'json':
+            subprocess.run([sys.executable, str(SCRIPT), '--data-dir', str(data_dir), 'migrate', '--to', args.backend],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+        print(f'{args.size} transactions, {args.backend} backend, {args.runs} runs per command')
+        print(f"{'command':<20}{'min ms':>10}{'median ms':>12}")
+
+        for name, argv in commands(out_dir).items():
+            timings = [time_command(data_dir, args.backend, argv, run) * 1000 for run in range(args.runs)]
+            print(f'{name:<20}{min(timings):>10.1f}{statistics.median(timings):>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from synthetic import SCRIPT, CATEGORIES
+
+
+def tracker(data_dir:Path, backend:str, group_commit:bool, argv:list) -> subprocess.CompletedProcess:
+    cmd = [sys.executable, str(SCRIPT), '--data-dir', str(data_dir), '--backend', backend, '--no-daemon']
+    if group_commit:
+        cmd.append('--group-commit')
+    return subprocess.run(cmd + argv, capture_output=True, text=True, check=True)
+
+
+def writer(data_dir:Path, backend:str, group_commit:bool, number:int, adds:int):
+    # one process per add, like cron jobs and shells racing each other
+    for i in range(adds):
+        tracker(data_dir, backend, group_commit, [
+            'add', 'expense', '--amount', f'{number + i / 100:.2f}',
+            '--category', CATEGORIES[i % 7], '--date', f'2025-{i % 12 + 1:02d}-{number % 28 + 1:02d}',
+            '--description', f'writer {number} add {i}',
+        ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that N concurrent writers never lose or duplicate a transaction')
+    parser.add_argument('--writers', type=int, default=8, help='Parallel writer processes')
+    parser.add_argument('--adds', type=int, default=150, help='Adds per writer (8 x 150 crosses the journal compaction threshold)')
+    parser.add_argument('--backend', choices=['json', 'sqlite', 'binary'], default='json', help='Storage backend to hammer')
+    parser.add_argument('--group-commit', action='store_true', help='Merge waiting writers into one save')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = Path(tmp)
+        expected = args.writers * args.adds
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.writers) as pool:
+            jobs = [pool.submit(writer, data_dir, args.backend, args.group_commit, n, args.adds) for n in range(args.writers)]
+            for job in jobs:
+                job.result()
+        elapsed = time.perf_counter() - start
+
+        export = data_dir / 'all.jsonl'
+        tracker(data_dir, args.backend, False, ['export', '--format', 'jsonl', '--file-path', tmp, '--file-name', export.name])
+        with open(export, 'r') as f:
+            rows = [json.loads(line) for line in f]
+
+        ids = [row['id'] for row in rows]
+        descriptions = {row['description'] for row in rows}
+        missing = {f'writer {n} add {i}' for n in range(args.writers) for i in range(args.adds)} - descriptions
+        check = tracker(data_dir, args.backend, False, ['rebuild-aggregates', '--check'])
+
+        mode = 'group commit' if args.group_commit else 'one save per add'
+        print(f'{args.writers} writers x {args.adds} adds, {args.backend} backend, {mode}: {expected / elapsed:.1f} adds/s')
+        print(f'stored {len(rows)} of {expected} transactions, {len(set(ids))} distinct ids, {len(missing)} missing')
+        print(check.stdout.strip())
+
+        ok = len(rows) == expected and len(set(ids)) == expected and not missing and 'match' in check.stdout
+        print('OK' if ok else 'FAILED')
+        sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import argparse
+import contextlib
+import gc
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from synthetic import SCRIPT, CATEGORIES, write_ledger
+
+# wider than the startup benchmark: many categories, ten years and a budget for every month
+EXPENSE_CATEGORIES = CATEGORIES[:7] + [f'Expense {n}' for n in range(8, 41)]
+INCOME_CATEGORIES = CATEGORIES[7:] + ['Interest', 'Dividends', 'Refund']
+YEARS = 10
+
+
+def load_tracker():
+    # the script is not an importable module name, so load it by path
+    spec = importlib.util.spec_from_file_location('finance_tracker', SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    # registered so that process pool workers can find its functions by name
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def operations(out_dir:Path) -> dict:
+    # None means "just load the ledger"; 'compact' rewrites the whole snapshot, i.e. the full save
+    return {
+        'load': None,
+        'add expense': ['add', 'expense', '--amount', '12.5', '--category', 'Groceries', '--date', '2025-01-03'],
+        'list': ['list', '--category', 'Groceries', '--month', '1', '--year', '2025'],
+        'report monthly': ['report', 'monthly', '--month', '1', '--year', '2025'],
+        'report yearly': ['report', 'yearly', '--year', '2025'],
+        'report category': ['report', 'category', '--year', '2025'],
+        'budget status': ['budget', 'status', '--month', '1', '--year', '2025'],
+        'export': ['export', '--format', 'csv', '--year', '2025', '--file-name', 'export.csv', '--file-path', str(out_dir), '--force'],
+        'save': ['compact'],
+    }
+
+
+def run(module, parser, data_dir:Path, backend:str, argv):
+    # a fresh tracker every time, like a CLI invocation: the ledger is read cold, and results are not served from the cache
+    tracker = module.FinanceTracker(base_dir=data_dir, backend=backend, cache_size=0)
+    with open(os.devnull, 'w') as null, contextlib.redirect_stdout(null):
+        if argv is None:
+            tracker.storage.load()
+        else:
+            args = parser.parse_args(argv)
+            args.func(tracker, args)
+
+
+def measure(module, parser, data_dir:Path, backend:str, argv, runs:int) -> dict:
+    timings = []
+    for _ in range(runs):
+        gc.collect()
+        start = time.perf_counter()
+        run(module, parser, data_dir, backend, argv)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # tracemalloc slows everything down, so memory gets a run of its own
+    gc.collect()
+    tracemalloc.start()
+    run(module, parser, data_dir, backend, argv)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {'min_ms': min(timings), 'median_ms': statistics.median(timings), 'peak_kb': peak / 1024}
+
+
+def compare(results:list, baseline_file:Path, tolerance:float) -> list:
+    with open(baseline_file, 'r') as f:
+        baseline = {(r['size'], r['backend'], r['operation']): r for r in json.load(f)['results']}
+
+    regressions = []
+    for r in results:
+        before = baseline.get((r['size'], r['backend'], r['operation']))
+        if before and r['median_ms'] > before['median_ms'] * tolerance:
+            regressions.append((r, before))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time and measure every finance tracker operation against synthetic ledgers')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000], help='Ledger sizes to generate (e.g. 10000 100000 1000000)')
+    parser.add_argument('--runs', type=int, default=5, help='Timed runs per operation')
+    parser.add_argument('--backend', choices=['json', 'sqlite', 'binary'], default='json', help='Storage backend to measure')
+    parser.add_argument('--json', type=str, help='Write the results to this file')
+    parser.add_argument('--compare', type=str, help='Results file from an earlier run; exit 1 if any operation got slower')
+    parser.add_argument('--tolerance', type=float, default=1.25, help='Allowed slowdown against --compare (default: 1.25x)')
+    args = parser.parse_args()
+
+    module = load_tracker()
+    tracker_parser = module.build_parser()
+    results = []
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            data_dir = Path(tmp) / 'ledger'
+            out_dir = Path(tmp) / 'exports'
+            data_dir.mkdir()
+            out_dir.mkdir()
+
+            write_ledger(data_dir, size, expense_categories=EXPENSE_CATEGORIES, income_categories=INCOME_CATEGORIES,
+                         years=YEARS, monthly_budgets=True)
+            if args.backend != 'json':
+                run(module, tracker_parser, data_dir, 'json', ['migrate', '--to', args.backend])
+            # measure steady state, not the one-off derivation of the meta file and the aggregates
+            module.FinanceTracker(base_dir=data_dir, backend=args.backend).storage.count()
+            run(module, tracker_parser, data_dir, args.backend, ['rebuild-aggregates'])
+
+            print(f'{size} transactions, {args.backend} backend, {args.runs} runs per operation')
+            print(f"{'operation':<20}{'min ms':>10}{'median ms':>12}{'peak KiB':>12}")
+
+            for name, argv in operations(out_dir).items():
+                result = measure(module, tracker_parser, data_dir, args.backend, argv, args.runs)
+                results.append({'size': size, 'backend': args.backend, 'operation': name, **result})
+                print(f"{name:<20}{result['min_ms']:>10.1f}{result['median_ms']:>12.1f}{result['peak_kb']:>12.0f}")
+            print()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'runs': args.runs,
+                'results': results,
+            }, f, indent=2)
+        print(f'Results written to {args.json}')
+
+    if args.compare:
+        regressions = compare(results, Path(args.compare), args.tolerance)
+        for r, before in regressions:
+            print(f"REGRESSION {r['operation']} at {r['size']} ({r['backend']}): {before['median_ms']:.1f} -> {r['median_ms']:.1f} ms")
+        if regressions:
+            sys.exit(1)
+        print(f'No operation is more than {args.tolerance}x slower than {args.compare}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import json
+import random
+from datetime import date, timedelta
+from pathlib import Path
+
+SCRIPT = Path(__file__).resolve().parent.parent / 'finance tracker.py'
+
+CATEGORIES = ['Groceries', 'Transport', 'Utilities', 'Rent', 'Dining', 'Health', 'Travel', 'Salary', 'Gift', 'Freelance']
+
+
+def write_ledger(data_dir:Path, size:int, seed:int = 42, expense_categories:list = CATEGORIES[:7],
+                 income_categories:list = CATEGORIES[7:], years:int = 6, monthly_budgets:bool = False):
+    # the same seed always gives the same ledger, so runs on different commits measure the same data
+    rng = random.Random(seed)
+    first_year = 2026 - years
+    start = date(first_year, 1, 1)
+
+    # one record per line, written as it is generated, so a 1M ledger never sits in memory as dicts
+    with open(data_dir / 'transactions.json', 'w') as f:
+        f.write('{\n  "transactions": [')
+        for i in range(1, size + 1):
+            tx_type = 'income' if rng.random() < 0.1 else 'expense'
+            tx = {
+                'id': i,
+                'type': tx_type,
+                'date': (start + timedelta(days=rng.randrange(years * 365))).strftime('%Y-%m-%d'),
+                'cents': round(round(rng.uniform(1, 3000 if tx_type == 'income' else 300), 2) * 100),
+                'category': rng.choice(income_categories if tx_type == 'income' else expense_categories),
+                'description': f'synthetic transaction {i}',
+            }
+            f.write(('\n    ' if i == 1 else ',\n    ') + json.dumps(tx))
+        f.write('\n  ]\n}\n')
+
+    if monthly_budgets:
+        months = [(year, month) for year in range(first_year, 2026) for month in range(1, 13)]
+    else:
+        months = [(2025, 1)]
+
+    budgets = []
+    for year, month in reversed(months):
+        next_month = date(year + month // 12, month % 12 + 1, 1)
+        budget = {
+            'id': len(budgets) + 1,
+            'start_date': date(year, month, 1).strftime('%Y-%m-%d'),
+            'end_date': (next_month - timedelta(days=1)).strftime('%Y-%m-%d'),
+        }
+        if monthly_budgets:
+            budget.update({category: 50 + 10 * (n % 10) for n, category in enumerate(expense_categories)})
+        else:
+            budget.update({'Groceries': 400, 'Transport': 100})
+        budget['total'] = sum(v for k, v in budget.items() if k not in ('id', 'start_date', 'end_date'))
+        budgets.append(budget)
+
+    with open(data_dir / 'budgets.json', 'w') as f:
+        json.dump({'budgets': budgets}, f, indent=2)
@@ -1,154 +1,2269 @@
 import argparse
+import contextlib
+import io
 import os
+import re
+import signal
+import socket
+import sys
 import tempfile
 from pathlib import Path
 import csv
+import gzip
+import hashlib
+import heapq
 import json
+import mmap
+import sqlite3
 from datetime import datetime, date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
 from collections import Counter, defaultdict
+from itertools import islice
 import calendar
 import logging
+import time
+from array import array
+from bisect import bisect_left, bisect_right
 
+try:
+    import fcntl
+except ImportError:
+    # no flock on Windows: the ledger lock does nothing there, so only run one writer at a time
+    fcntl = None
 
-# Basic logging config for debugginq
-logging.basicConfig(level=logging.DEBUG, format='[%(levelname)s] %(message)s')
+# number of journaled transactions after which the journal is folded back into transactions.json
+JOURNAL_COMPACT_THRESHOLD = 1000
 
-class FinanceTracker:
+# how many invalid rows an import reports individually before summarizing
+IMPORT_ERRORS_SHOWN = 10
 
-    def __init__(self, base_dir = None):
+# with --engine auto, ledgers from this many transactions up are filtered and totalled with NumPy (if installed)
+NUMPY_MIN_ROWS = 100_000
+ENGINES = ('auto', 'python', 'numpy')
 
-        self.BASE_DIR = Path(base_dir).expanduser().resolve() if base_dir else Path(__file__).resolve().parent
-        self.TRANSACTION_FILE = self.BASE_DIR / 'transactions.json'
-        self.BUDGET_FILE = self.BASE_DIR / 'budgets.json'
+# orders list can show transactions in: by date, or by amount (ties newest first)
+LIST_ORDERS = ('newest', 'oldest', 'largest', 'smallest')
+# list writes its output this many transactions at a time
+LIST_BUFFER_ROWS = 500
+
+# default size cap of the result cache, in MiB; 0 turns it off
+CACHE_SIZE_MB = 64
+
+# logging is configured in main() from --log-level; messages use %-style arguments so nothing is formatted unless it is shown
+LOG_LEVELS = ('debug', 'info', 'warning', 'error')
 
-        self.BASE_DIR.mkdir(parents=True, exist_ok=True)
 
-        if self.TRANSACTION_FILE.exists():
-            with open(self.TRANSACTION_FILE, 'r') as f:
-                self.transactions = json.load(f)
+def parse_date(s):
+    if not s:
+        return None
+    # fromisoformat is much faster than strptime; strptime still accepts unpadded dates and gives the usual error
+    try:
+        return date.fromisoformat(s)
+    except ValueError:
+        return datetime.strptime(s, '%Y-%m-%d').date()
+
+
+def date_argument(value:str) -> str:
+    # argparse type for --date and the date filters: an impossible date is a usage error, and the command always gets
+    # YYYY-MM-DD, which is what the ledger stores and what SQLite compares as text
+    try:
+        parsed = parse_date(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+    if parsed is None:
+        raise argparse.ArgumentTypeError('expected a date (YYYY-MM-DD)')
+    return parsed.isoformat()
+
+
+# Money is held as integer cents everywhere: on disk, in SQLite, in the aggregates and in every sum.
+# Amounts only become decimals again when they are printed or exported.
+
+def to_cents(amount) -> int:
+    # through the decimal text rather than float arithmetic, so 0.1 is exactly 10 cents and half a cent rounds up
+    try:
+        cents = (Decimal(str(amount).strip()) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f'invalid amount {amount!r}') from None
+    if not cents.is_finite():
+        raise ValueError(f'invalid amount {amount!r}')
+    return int(cents)
+
+
+def cents_argument(value:str) -> int:
+    # argparse type for --amount: the command gets the cents, a bad amount is a usage error
+    try:
+        return to_cents(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def format_cents(cents:int) -> str:
+    return f"{'-' if cents < 0 else ''}{abs(cents) // 100}.{abs(cents) % 100:02d}"
+
+
+def resolve_base_dir(base_dir = None) -> Path:
+    return Path(base_dir).expanduser().resolve() if base_dir else Path(__file__).resolve().parent
+
+
+def save_json(file:Path, data:dict):
+    # write to a temp file next to the target and swap it in, so readers never see half a file
+    with STATS.phase('serialize'), tempfile.NamedTemporaryFile('w', dir=file.parent, delete=False) as tmp:
+        json.dump(data, tmp, indent=2)
+        temp_name = tmp.name
+
+    os.replace(temp_name, file)
+
+
+# ================ INSTRUMENTATION ================
+# Opt-in timers and counters behind --profile and --stats-json. Phases are load, parse, index (building the search
+# index), search (looking words up in it), filter, sort, aggregate, serialize and fsync; a phase entered inside another
+# one is taken out of the outer one, so the times add up.
+# Counters: 'scanned' rows looked at after the date index narrowed the range, 'matched' rows that passed every filter;
+# 'rollup_scanned' monthly aggregate rows looked at and 'rollup_matched' the transactions they stood in for.
+# Switched off, phase() hands back one shared no-op context manager and count() returns straight away.
+
+class Instrumentation:
+
+    PHASES = ('load', 'parse', 'index', 'search', 'filter', 'sort', 'aggregate', 'serialize', 'fsync')
+
+    def __init__(self):
+        self.enabled = False
+        self._off = contextlib.nullcontext()
+        self.reset()
+
+    def reset(self):
+        self.phases = defaultdict(float)
+        self.calls = Counter()
+        self.counters = Counter()
+        self._stack = []
+        self._started = time.perf_counter()
+
+    def enable(self):
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def phase(self, name:str):
+        if not self.enabled:
+            return self._off
+        return self._timed(name)
+
+    def count(self, name:str, n:int = 1):
+        if self.enabled:
+            self.counters[name] += n
+
+    @contextlib.contextmanager
+    def _timed(self, name:str):
+        now = time.perf_counter()
+        # the enclosing phase stops its clock while this one runs
+        if self._stack:
+            outer = self._stack[-1]
+            self.phases[outer[0]] += now - outer[1]
+        entry = [name, now]
+        self._stack.append(entry)
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._stack.pop()
+            self.phases[name] += now - entry[1]
+            self.calls[name] += 1
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def summary(self) -> dict:
+        total = time.perf_counter() - self._started
+        phases = {name: {'ms': round(self.phases[name] * 1000, 3), 'calls': self.calls[name]}
+                  for name in sorted(self.phases, key=self.PHASES.index)}
+        return {
+            'total_ms': round(total * 1000, 3),
+            # interpreter work outside every phase: argument handling, budget arithmetic, printing reports
+            'other_ms': round((total - sum(self.phases.values())) * 1000, 3),
+            'phases': phases,
+            'counters': dict(self.counters),
+        }
+
+    def table(self) -> str:
+        summary = self.summary()
+        lines = [f"{'phase':<12}{'ms':>12}{'calls':>8}"]
+        for name, phase in summary['phases'].items():
+            lines.append(f"{name:<12}{phase['ms']:>12.2f}{phase['calls']:>8}")
+        lines.append(f"{'other':<12}{summary['other_ms']:>12.2f}")
+        lines.append(f"{'total':<12}{summary['total_ms']:>12.2f}")
+        for name, value in summary['counters'].items():
+            lines.append(f'{name:<12}{value:>12}')
+        return '\n'.join(lines)
+
+
+STATS = Instrumentation()
+
+
+# ================ CONCURRENT WRITERS ================
+# Several processes (cron jobs, a shell, the daemon) may write the same data directory at once.
+# Every read-modify-write of the ledger files happens while holding an advisory flock on ledger.lock,
+# and ids are handed out from the stored counter while it is held, never from the number of rows.
+
+class LedgerLock:
+
+    def __init__(self, file:Path):
+        self.FILE = file
+        self._fd = None
+        self._depth = 0
+        self._shared = False
+
+    @contextlib.contextmanager
+    def hold(self, shared=False):
+        # re-entrant: nested holds in the same process share the outer lock
+        if self._depth == 0:
+            if fcntl is not None:
+                self._fd = os.open(self.FILE, os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(self._fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            self._shared = shared
+        elif self._shared and not shared:
+            raise RuntimeError(f'{self.FILE} is held shared and cannot be upgraded to a write lock')
+
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0 and self._fd is not None:
+                # closing the descriptor releases the lock
+                os.close(self._fd)
+                self._fd = None
+
+
+class WriteSpool:
+    # Group commit. A writer parks its rows here before it waits for the ledger lock. Whoever gets the lock
+    # next writes every parked batch in one save, so writers that queued up behind it find their batch gone
+    # and have nothing left to do.
+
+    def __init__(self, directory:Path):
+        self.DIR = directory
+
+    def park(self, tx_list:list) -> Path:
+        self.DIR.mkdir(exist_ok=True)
+        batch = self.DIR / f'{time.time_ns()}-{os.getpid()}.json'
+        # save_json swaps the file in whole, so a batch is never seen half written
+        save_json(batch, {'transactions': tx_list})
+        return batch
+
+    def take(self) -> tuple:
+        batches = sorted(self.DIR.glob('*.json'))
+        tx_list = []
+        for batch in batches:
+            with open(batch, 'r') as f:
+                tx_list += json.load(f)['transactions']
+        return batches, tx_list
+
+
+# ================ COLUMNAR TRANSACTION STORE ================
+# Transactions held by JsonStorage are kept as parallel columns instead of one dict per record.
+# Dates are parsed once at load, amounts are integer cents and type/category are small integer codes,
+# so the filter and report loops compare ints. Rows are only turned back into dicts when they are returned.
+# NumPy is optional: when it is used, filters become array masks over zero-copy views of the columns and
+# totals become bincount reductions. Both engines give exactly the same results, in the same order.
+
+_numpy = None
+
+
+def load_numpy():
+    # importing NumPy costs more than a small report, so it is only looked for the first time it would be used
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+            if TransactionColumns.engine == 'numpy':
+                logging.warning('NumPy is not installed, using the pure-Python engine')
+    return _numpy or None
+
+
+def _ascending(values:array, first:int) -> bool:
+    # whether values[first:] is strictly increasing
+    return all(map(int.__lt__, islice(values, first, None), islice(values, first + 1, None)))
+
+
+class TransactionColumns:
+
+    __slots__ = ('ids', 'ordinals', 'periods', 'cents', 'types', 'categories', 'descriptions',
+                 'category_names', 'category_codes', '_dates', '_strings', '_order', '_sorted_ordinals', '_positions')
+
+    TYPES = ('expense', 'income')
+    TYPE_CODES = {'expense': 0, 'income': 1}
+
+    # 'auto', 'python' or 'numpy'; set from --engine
+    engine = 'auto'
+
+    def __init__(self):
+        self.ids = array('q')
+        self.ordinals = array('i')
+        # year * 12 + month - 1, so year and month filters are integer comparisons
+        self.periods = array('i')
+        self.cents = array('q')
+        self.types = array('b')
+        self.categories = array('i')
+        self.descriptions = []
+
+        self.category_names = []
+        self.category_codes = {}
+        self._dates = {}
+        self._strings = {}
+
+        # date index: row positions sorted by date, plus their ordinals for bisect. Built on first use.
+        self._order = None
+        self._sorted_ordinals = None
+        # True while the id column is in ascending order, else an id -> row map; None until positions() is used
+        self._positions = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def extend(self, tx_list:list, category_table:list = None):
+        # with a category_table, each record's category is a position in it rather than the name (transactions.json)
+        first = len(self.ids)
+
+        # the load path: every lookup is bound to a local once instead of once per record
+        dates, strings = self._dates, self._strings
+        category_codes, category_names, type_codes = self.category_codes, self.category_names, self.TYPE_CODES
+        ids, ordinals, periods, cents = self.ids.append, self.ordinals.append, self.periods.append, self.cents.append
+        types, categories, descriptions = self.types.append, self.categories.append, self.descriptions.append
+
+        # the table translated to codes once, so those records never look a name up
+        table_codes = None
+        if category_table is not None:
+            table_codes = []
+            for category in category_table:
+                code = category_codes.get(category)
+                if code is None:
+                    code = category_codes[category] = len(category_names)
+                    category_names.append(category)
+                table_codes.append(code)
+
+        for tx in tx_list:
+            # ledgers repeat the same dates over and over, so each distinct date string is parsed once
+            parsed = dates.get(tx['date'])
+            if parsed is None:
+                tx_date = parse_date(tx['date'])
+                parsed = dates[tx['date']] = (tx_date.toordinal(), tx_date.year * 12 + tx_date.month - 1)
+
+            if table_codes is None:
+                code = category_codes.get(tx['category'])
+                if code is None:
+                    code = category_codes[tx['category']] = len(category_names)
+                    category_names.append(tx['category'])
+            else:
+                code = table_codes[tx['category']]
+
+            description = tx.get('description')
+            amount = tx.get('cents')
+            if amount is None:
+                # a ledger written before amounts were stored as cents; they were always rounded to two decimals
+                amount = round(tx['amount'] * 100)
+
+            ids(tx['id'])
+            ordinals(parsed[0])
+            periods(parsed[1])
+            cents(amount)
+            types(type_codes[tx['type']])
+            categories(code)
+            descriptions(strings.setdefault(description, description))
+
+        if self._order is not None:
+            self._index_rows(first)
+        # new rows normally carry the next ids; only if they don't is the id lookup built again
+        if self._positions is not True or not _ascending(self.ids, max(first - 1, 0)):
+            self._positions = None
+
+    def to_arrays(self) -> dict:
+        # every column plus the date index, for the binary snapshot
+        return {
+            'ids': self.ids, 'ordinals': self.ordinals, 'periods': self.periods, 'cents': self.cents,
+            'types': self.types, 'categories': self.categories, 'order': self.order, 'sorted_ordinals': self._sorted_ordinals,
+        }
+
+    def from_arrays(self, arrays:dict, category_names:list, descriptions):
+        self.ids, self.ordinals, self.periods, self.cents = arrays['ids'], arrays['ordinals'], arrays['periods'], arrays['cents']
+        self.types, self.categories = arrays['types'], arrays['categories']
+        self._order, self._sorted_ordinals = arrays['order'], arrays['sorted_ordinals']
+        self.category_names = category_names
+        self.category_codes = {name: code for code, name in enumerate(category_names)}
+        self.descriptions = descriptions
+        self._positions = None
+
+    def positions(self, ids) -> list:
+        # rows holding these transaction ids, in ledger order. Ids are handed out in ledger order, so the id
+        # column is normally sorted and each id is found with bisect; otherwise an id -> row map is built once
+        column = self.ids
+        if len(ids) * 8 > len(column):
+            # a good part of the ledger: one pass over the column beats a lookup per id
+            ids = ids if isinstance(ids, (set, frozenset)) else set(ids)
+            return [i for i, tx_id in enumerate(column) if tx_id in ids]
+
+        if self._positions is None:
+            self._positions = True if _ascending(column, 0) else {tx_id: i for i, tx_id in enumerate(column)}
+
+        if self._positions is True:
+            rows = []
+            for tx_id in ids:
+                i = bisect_left(column, tx_id)
+                if i < len(column) and column[i] == tx_id:
+                    rows.append(i)
         else:
-            self.transactions = {'transactions': []}
+            rows = [i for i in map(self._positions.get, ids) if i is not None]
+        rows.sort()
+        return rows
+
+    def row(self, i) -> dict:
+        return {
+            'id': self.ids[i],
+            'type': self.TYPES[self.types[i]],
+            'date': date.fromordinal(self.ordinals[i]).isoformat(),
+            'cents': self.cents[i],
+            'category': self.category_names[self.categories[i]],
+            'description': self.descriptions[i],
+        }
+
+    def record(self, i, codes:list) -> dict:
+        # a row as transactions.json stores it: the category as its position in the table codes translates into
+        tx = self.row(i)
+        tx['category'] = codes[self.categories[i]]
+        return tx
+
+    @property
+    def order(self) -> array:
+        if self._order is None:
+            ordinals = self.ordinals
+            with STATS.phase('sort'):
+                # a stable sort, so rows on the same date stay in ledger order
+                self._order = array('q', sorted(range(len(ordinals)), key=ordinals.__getitem__))
+                self._sorted_ordinals = array('i', [ordinals[i] for i in self._order])
+        return self._order
+
+    def match(self, type=None, category=None, start=None, end=None, month=None, year=None, ordered=False, rows=None):
+        # rows, if given, are the only row positions looked at (in ledger order), e.g. the hits of a search
+        bounds = self._date_bounds(start, end, month, year)
+
+        if bounds is None:
+            return []
+
+        # a handful of rows is filtered faster in Python than by building masks
+        np = self._numpy() if rows is None else None
+        with STATS.phase('filter'):
+            if np:
+                indices = self._match_numpy(np, bounds, type, category, month, year, ordered)
+            else:
+                indices = self._match(bounds, type, category, month, year, ordered, rows)
+
+        STATS.count('matched', len(indices))
+        return indices
+
+    def _match(self, bounds, type, category, month, year, ordered, rows=None):
+        if rows is not None:
+            lo, hi = bounds
+            ordinals = self.ordinals
+            indices = [i for i in rows if (lo is None or ordinals[i] >= lo) and (hi is None or ordinals[i] <= hi)]
+            if ordered:
+                # stable, so rows on the same date stay in ledger order, as in the date index
+                indices.sort(key=ordinals.__getitem__)
+        elif bounds != (None, None) or ordered:
+            # only the slice of the date index inside the range is looked at, and it comes out in date order
+            order = self.order
+            lo, hi = bounds
+            first = bisect_left(self._sorted_ordinals, lo) if lo is not None else 0
+            last = bisect_right(self._sorted_ordinals, hi) if hi is not None else len(order)
+            indices = order[first:last]
+            if not ordered:
+                # back in ledger order, which is what every backend returns when no order is asked for
+                indices = sorted(indices)
+        else:
+            indices = range(len(self.ids))
+
+        STATS.count('scanned', len(indices))
+
+        if type:
+            code = self.TYPE_CODES.get(type)
+            types = self.types
+            indices = [i for i in indices if types[i] == code]
 
+        if category:
+            code = self.category_codes.get(category)
+            if code is None:
+                return []
+            categories = self.categories
+            indices = [i for i in indices if categories[i] == code]
+
+        # a month without a year is the one date filter the index cannot answer
+        if month and not year:
+            periods = self.periods
+            indices = [i for i in indices if periods[i] % 12 == month - 1]
+
+        return indices
+
+    def totals(self, group_by:tuple, indices) -> dict:
+        np = self._numpy()
+        with STATS.phase('aggregate'):
+            if np:
+                return self._totals_numpy(np, group_by, indices)
+            return self._totals(group_by, indices)
+
+    def _totals(self, group_by:tuple, indices) -> dict:
+        cents = self.cents
+
+        if not group_by:
+            return {(): (sum(cents[i] for i in indices), len(indices))} if indices else {}
+
+        # group on the raw integer codes first, then translate each distinct key once
+        sources = {
+            'year': (self.periods, lambda p: p // 12),
+            'month': (self.periods, lambda p: p % 12 + 1),
+            'type': (self.types, self.TYPES.__getitem__),
+            'category': (self.categories, self.category_names.__getitem__),
+        }
+        columns = [sources[field] for field in group_by]
+        keys = list(zip(*[[column[i] for i in indices] for column, _ in columns]))
+
+        counts = Counter(keys)
+        sums = dict.fromkeys(counts, 0)
+        for key, i in zip(keys, indices):
+            sums[key] += cents[i]
+
+        totals = defaultdict(lambda: [0, 0])
+        for raw_key, count in counts.items():
+            key = tuple(translate(value) for (_, translate), value in zip(columns, raw_key))
+            totals[key][0] += sums[raw_key]
+            totals[key][1] += count
+
+        return {k: tuple(v) for k, v in totals.items()}
+
+
+    def _numpy(self):
+        if self.engine == 'python' or (self.engine == 'auto' and len(self.ids) < NUMPY_MIN_ROWS):
+            return None
+        return load_numpy()
+
+    def _match_numpy(self, np, bounds, type, category, month, year, ordered):
+        indices = None
+        if bounds != (None, None) or ordered:
+            order = self.order
+            lo, hi = bounds
+            first = bisect_left(self._sorted_ordinals, lo) if lo is not None else 0
+            last = bisect_right(self._sorted_ordinals, hi) if hi is not None else len(order)
+            indices = np.array(order[first:last], dtype=np.int64)
+            if not ordered:
+                indices.sort()
+
+        STATS.count('scanned', len(self.ids) if indices is None else len(indices))
+
+        def column(values):
+            # a view for the duration of this call; holding on to it would stop the column from growing
+            view = np.frombuffer(values, dtype=values.typecode)
+            return view if indices is None else view[indices]
+
+        mask = None
+        if type:
+            mask = column(self.types) == self.TYPE_CODES.get(type, -1)
+
+        if category:
+            code = self.category_codes.get(category)
+            if code is None:
+                return []
+            matches = column(self.categories) == code
+            mask = matches if mask is None else mask & matches
+
+        if month and not year:
+            matches = column(self.periods) % 12 == month - 1
+            mask = matches if mask is None else mask & matches
+
+        if mask is not None:
+            return np.flatnonzero(mask) if indices is None else indices[mask]
+        return np.arange(len(self.ids)) if indices is None else indices
+
+    def _totals_numpy(self, np, group_by:tuple, indices) -> dict:
+        if not len(indices):
+            return {}
+
+        indices = np.asarray(indices, dtype=np.int64)
+        cents = np.frombuffer(self.cents, dtype=self.cents.typecode)[indices]
+
+        if not group_by:
+            return {(): (int(cents.sum()), len(indices))}
+
+        periods = np.frombuffer(self.periods, dtype=self.periods.typecode)[indices]
+        sources = {
+            'year': (lambda: periods // 12, lambda p: p),
+            'month': (lambda: periods % 12 + 1, lambda p: p),
+            'type': (lambda: np.frombuffer(self.types, dtype=self.types.typecode)[indices], self.TYPES.__getitem__),
+            'category': (lambda: np.frombuffer(self.categories, dtype=self.categories.typecode)[indices], self.category_names.__getitem__),
+        }
+        columns = [(sources[field][0]().astype(np.int64), sources[field][1]) for field in group_by]
+
+        # one integer per row encodes the whole group key, so the grouping is a single unique()
+        key = np.zeros(len(indices), dtype=np.int64)
+        for values, _ in columns:
+            key = key * (int(values.max()) + 1) + values
+        _, first, inverse = np.unique(key, return_index=True, return_inverse=True)
+
+        counts = np.bincount(inverse)
+        # float64 adds integer cents exactly up to 2**53, far beyond any ledger
+        sums = np.bincount(inverse, weights=cents)
+
+        totals = defaultdict(lambda: [0, 0])
+        # groups in order of their first row, like the pure-Python engine
+        for group in np.argsort(first, kind='stable'):
+            row = first[group]
+            key = tuple(translate(int(values[row])) for values, translate in columns)
+            totals[key][0] += int(round(sums[group]))
+            totals[key][1] += int(counts[group])
+
+        return {k: tuple(v) for k, v in totals.items()}
+
+    def _index_rows(self, first:int):
+        ordinals, order, sorted_ordinals = self.ordinals, self._order, self._sorted_ordinals
+        new_rows = sorted(range(first, len(ordinals)), key=ordinals.__getitem__)
+
+        # a big batch of back-dated rows is cheaper to index by re-sorting everything
+        if len(new_rows) > len(order) // 4 and new_rows and sorted_ordinals and ordinals[new_rows[0]] < sorted_ordinals[-1]:
+            self._order = None
+            self.order
+            return
+
+        for i in new_rows:
+            # after every existing row on the same date; usually this is the end of the index
+            position = bisect_right(sorted_ordinals, ordinals[i])
+            order.insert(position, i)
+            sorted_ordinals.insert(position, ordinals[i])
+
+    def _date_bounds(self, start, end, month, year):
+        # the inclusive (lo, hi) ordinal range covered by the date filters; None when nothing can match
+        lo = start.toordinal() if start else None
+        hi = end.toordinal() if end else None
+
+        if year:
+            first_day = date(year, month or 1, 1)
+            last_day = date(year, month or 12, calendar.monthrange(year, month or 12)[1])
+            lo = max(lo, first_day.toordinal()) if lo is not None else first_day.toordinal()
+            hi = min(hi, last_day.toordinal()) if hi is not None else last_day.toordinal()
+
+        if lo is not None and hi is not None and lo > hi:
+            return None
+        return lo, hi
+
+
+# ================ STORAGE BACKENDS ================
+# Every backend answers the same questions so FinanceTracker never touches files or SQL directly.
+# Filters are keyword arguments: type, category, start, end (dates), month, year. None means "don't filter".
+
+class JsonStorage:
+
+    def __init__(self, base_dir:Path):
+        self.TRANSACTION_FILE = base_dir / 'transactions.json'
+        self.BUDGET_FILE = base_dir / 'budgets.json'
+        self.JOURNAL_FILE = base_dir / 'transactions.journal'
+        # next id and journal length, so adding a transaction never has to read the ledger
+        self.META_FILE = base_dir / 'transactions.meta.json'
+        self.ROLLUP_FILE = base_dir / 'aggregates.json'
+        self.CATEGORY_FILE = base_dir / 'categories.json'
+        self.CACHE_DIR = base_dir / 'cache'
+        self.SEARCH_FILE = base_dir / 'search.idx'
+        # batches parked by group commit
+        self.SPOOL_DIR = base_dir / 'pending'
+        self.lock = LedgerLock(base_dir / 'ledger.lock')
+
+        # the ledger is only read the first time a command actually needs it
+        self._columns = None
+        self._meta = None
+        # transactions added with defer=True that are not on disk yet
+        self._pending = []
+        # which snapshot the columns were loaded from and how much of the journal they hold,
+        # so refresh() can tell what other processes wrote since
+        self._loaded_stamp = None
+        self._journal_offset = 0
+        # (snapshot stamp, journal offset) as of the last changes() call
+        self._followed = None
+
+    @property
+    def columns(self) -> TransactionColumns:
+        if self._columns is None:
+            # a shared lock keeps a compaction from swapping the snapshot and truncating the journal mid-read
+            with self.lock.hold(shared=True):
+                self._columns = TransactionColumns()
+                self._loaded_stamp = self._snapshot_stamp()
+
+                if self.TRANSACTION_FILE.exists():
+                    self._read_snapshot(self._columns)
+
+                # new transactions are appended to the journal and folded into the snapshot on compaction
+                with STATS.phase('parse'):
+                    journal_size = self._replay_journal()
+
+            logging.debug("Loaded %s transactions (%s from journal)", len(self._columns), journal_size)
+
+        return self._columns
+
+    @property
+    def meta(self) -> dict:
+        if self._meta is None:
+            self._meta = self._read_meta()
+            if self._meta is None:
+                with self.lock.hold():
+                    # checked again under the lock, since a writer may just have been between its journal write and its meta save
+                    self._meta = self._read_meta()
+                    if self._meta is None:
+                        # first run against an existing ledger, or a writer died before saving the counters: derive them
+                        if self.META_FILE.exists():
+                            logging.warning('%s is out of step with %s, counting the ledger again', self.META_FILE, self.JOURNAL_FILE)
+                        columns = self.columns
+                        self._meta = {
+                            # past the highest id rather than the row count, in case rows were deleted by hand
+                            'next_id': max(columns.ids, default=0) + 1,
+                            'count': len(columns),
+                            'journal_size': self._journal_length(),
+                            'journal_bytes': self._journal_bytes(),
+                        }
+                        self._save(self.META_FILE, self._meta)
+
+        return self._meta
+
+    def _read_meta(self):
+        # None when there is no meta file, or when the journal isn't the size the counters were saved against
+        if not self.META_FILE.exists():
+            return None
+        with open(self.META_FILE, 'r') as f:
+            meta = json.load(f)
+        journal_bytes = self._journal_bytes()
+        if meta.get('journal_bytes', journal_bytes) != journal_bytes:
+            return None
+        return meta
+
+    def _journal_bytes(self) -> int:
+        return self.JOURNAL_FILE.stat().st_size if self.JOURNAL_FILE.exists() else 0
+
+    def load(self):
+        self.columns.order
+
+    def refresh(self):
+        # pick up whatever other processes wrote since this one last read the ledger
+        self._meta = None
+        if self._columns is None:
+            return
+
+        with self.lock.hold(shared=True):
+            journal_bytes = self._journal_bytes()
+
+            if self._snapshot_stamp() != self._loaded_stamp or journal_bytes < self._journal_offset:
+                # someone compacted: the snapshot and the journal were both rewritten, so start over
+                logging.debug("%s changed on disk, reloading", self.TRANSACTION_FILE)
+                self._columns = None
+                if self._pending:
+                    self.columns.extend(self._pending)
+            elif journal_bytes > self._journal_offset:
+                with STATS.phase('parse'):
+                    replayed = self._replay_journal(self._journal_offset)
+                logging.debug("Picked up %s transactions journaled by other writers", replayed)
+
+    def stamp(self):
+        # differs after every write to the ledger or the budgets; watch mode polls it
+        return self._snapshot_stamp(), self._file_stamp(self.JOURNAL_FILE), self.budget_stamp()
+
+    def budget_stamp(self):
+        return self._file_stamp(self.BUDGET_FILE)
+
+    def changes(self):
+        # the transactions other processes journaled since the last call, without loading the ledger. None on the first
+        # call, or when a compaction rewrote the snapshot and started the journal over, since what is new can't be told then
+        with self.lock.hold(shared=True):
+            stamp = self._snapshot_stamp()
+            journal_bytes = self._journal_bytes()
+            previous, self._followed = self._followed, (stamp, journal_bytes)
+
+            if previous is None or previous[0] != stamp or journal_bytes < previous[1]:
+                return None
+            if journal_bytes == previous[1]:
+                return []
+
+            tx_list, end = self._read_journal(previous[1])
+            self._followed = (stamp, end)
+            return tx_list
+
+    def count(self, **filters) -> int:
+        if not any(filters.values()):
+            if self._columns is None:
+                return self.meta['count']
+            return len(self.columns)
+        return len(self.columns.match(**filters))
+
+    def add_transactions(self, tx_list:list, defer=False):
+        with self.lock.hold():
+            self.refresh()
+            meta = self.meta
+
+            # ids are only handed out here, from the stored counter, while the lock is held
+            for tx in tx_list:
+                if tx.get('id') is None:
+                    tx['id'] = meta['next_id']
+                meta['next_id'] = max(meta['next_id'], tx['id'] + 1)
+
+            # the columns must hold every row before a compaction writes them out
+            compacting = meta['journal_size'] + len(self._pending) + len(tx_list) >= JOURNAL_COMPACT_THRESHOLD
+            if defer or compacting or self._columns is not None:
+                self.columns.extend(tx_list)
+
+            if defer:
+                # visible to queries right away, written by the next flush(); the ids are reserved now, but the count
+                # only goes up once the rows are in the journal, so a daemon that dies first leaves a gap in the ids
+                self._pending.extend(tx_list)
+                self._save(self.META_FILE, meta)
+                return
+
+            self._commit(tx_list)
+
+    def flush(self):
+        if self._pending:
+            with self.lock.hold():
+                self.refresh()
+                pending, self._pending = self._pending, []
+                self._commit(pending)
+
+    def select(self, order=None, limit=None, offset=0, ids=None, **filters):
+        # order is None (ledger order) or one of LIST_ORDERS; ids, if given, limits the rows to those transactions
+        columns = self.columns
+        rows = columns.positions(ids) if ids is not None else None
+        indices = columns.match(ordered=order is not None, rows=rows, **filters)
+        end = offset + limit if limit is not None else None
+
+        # matches come out of the date index oldest first, so newest first is just the reverse
+        if order in ('largest', 'smallest'):
+            # only the rows up to the end of the page are put in order, in a heap, instead of sorting every match;
+            # the heap keeps ties in the order it was fed, newest first
+            pick = heapq.nlargest if order == 'largest' else heapq.nsmallest
+            with STATS.phase('sort'):
+                indices = pick(end if end is not None else len(indices), reversed(indices), key=columns.cents.__getitem__)
+        elif order == 'newest':
+            indices = reversed(indices)
+
+        # rows are only built for the page that is returned
+        return (columns.row(i) for i in islice(indices, offset, end))
+
+    def totals(self, group_by:tuple, **filters) -> dict:
+        columns = self.columns
+        return columns.totals(group_by, columns.match(**filters))
+
+    def slice_totals(self, group_by:tuple, part:int, parts:int) -> dict:
+        columns = self.columns
+        size = len(columns)
+        return columns.totals(group_by, range(size * part // parts, size * (part + 1) // parts))
+
+    def for_worker(self):
+        # forked scan workers share the loaded columns copy-on-write
+        return self
+
+    def compact(self):
+        with self.lock.hold():
+            self.refresh()
+            # deferred rows are already in the columns, so the snapshot covers them
+            self._pending = []
+            self._compact()
+
+    def load_budgets(self) -> dict:
         if self.BUDGET_FILE.exists():
             with open(self.BUDGET_FILE, 'r') as j:
-                self.budgets = json.load(j)
-        else:
-            self.budgets = {'budgets': []}
+                return json.load(j)
+        return {'budgets': []}
+
+    def save_budgets(self, budgets:dict):
+        self._save(self.BUDGET_FILE, budgets)
+
+    def _save(self, file:Path, data:dict):
+        logging.debug("Saving data to %s", file)
+        save_json(file, data)
+
+    def _commit(self, tx_list:list):
+        meta = self.meta
+
+        if meta['journal_size'] + len(tx_list) >= JOURNAL_COMPACT_THRESHOLD:
+            # the journal would be folded right away anyway, so write the new snapshot directly
+            self._compact()
+            return
+
+        with STATS.phase('serialize'):
+            entries = ''.join(json.dumps(tx) + '\n' for tx in tx_list).encode()
+
+        with open(self.JOURNAL_FILE, 'ab') as f:
+            f.write(entries)
+            with STATS.phase('fsync'):
+                f.flush()
+                os.fsync(f.fileno())
+            # these rows are in the columns already, so refresh() starts reading after them
+            self._journal_offset = f.tell()
+
+        # the counters are saved once the rows are in the journal, along with its size; a crash in between leaves the
+        # journal longer than the meta says, and the next read counts the ledger again instead of trusting it
+        meta['count'] += len(tx_list)
+        meta['journal_size'] += len(tx_list)
+        meta['journal_bytes'] = self._journal_offset
+        self._save(self.META_FILE, meta)
+
+    def _compact(self):
+        logging.debug("Compacting %s journaled transactions into %s", self.meta['journal_size'], self.TRANSACTION_FILE)
+
+        self._write_snapshot()
+        # the snapshot now holds every journaled transaction, so the journal can start over
+        with open(self.JOURNAL_FILE, 'w'):
+            pass
+        self._loaded_stamp = self._snapshot_stamp()
+        self._journal_offset = 0
+
+        # the snapshot is the whole ledger now, so the counters are taken from it rather than carried over
+        meta = self.meta
+        columns = self.columns
+        meta['next_id'] = max(meta['next_id'], max(columns.ids, default=0) + 1)
+        meta['count'] = len(columns)
+        meta['journal_size'] = 0
+        meta['journal_bytes'] = 0
+        self._save(self.META_FILE, meta)
+
+    def _read_snapshot(self, columns:TransactionColumns):
+        with STATS.phase('load'), open(self.TRANSACTION_FILE, 'r') as f:
+            raw = f.read()
+        with STATS.phase('parse'):
+            snapshot = json.loads(raw)
+            del raw
+            # snapshots written before the category table have the name in every record
+            columns.extend(snapshot['transactions'], snapshot.get('categories'))
+
+    def _write_snapshot(self):
+        columns = self.columns
+        logging.debug("Saving %s transactions to %s", len(columns), self.TRANSACTION_FILE)
+        names, codes = self._category_table()
+
+        # one record per line, written a record at a time instead of from a list of dicts.
+        # Category names are written once, in a table; each record has its category's position in it.
+        with STATS.phase('serialize'), tempfile.NamedTemporaryFile('w', dir=self.TRANSACTION_FILE.parent, delete=False) as tmp:
+            tmp.write('{\n  "categories": ' + json.dumps(names) + ',\n  "transactions": [')
+            tmp.write(','.join('\n    ' + json.dumps(columns.record(i, codes)) for i in range(len(columns))))
+            tmp.write('\n  ]\n}\n')
+            temp_name = tmp.name
+
+        os.replace(temp_name, self.TRANSACTION_FILE)
+
+    def _category_table(self) -> tuple:
+        # the snapshot's category table is the registry's list, so a category's position in it is its id - 1 and the ledger
+        # doesn't keep a numbering of its own. Returns the names and, for each column code, its position.
+        # Snapshots are written under the ledger lock, so a name the registry doesn't have yet (an old ledger) can be added.
+        registry = CategoryRegistry(self.CATEGORY_FILE)
+        registry.include(self.columns.category_names)
+        return registry.names, [registry.id(name) - 1 for name in self.columns.category_names]
+
+    def _snapshot_stamp(self):
+        # os.replace gives every new snapshot a new inode
+        return self._file_stamp(self.TRANSACTION_FILE)
+
+    def _file_stamp(self, file:Path):
+        try:
+            st = file.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _replay_journal(self, offset:int = 0) -> int:
+        if not self.JOURNAL_FILE.exists():
+            self._journal_offset = 0
+            return 0
+
+        columns = self._columns
+        new_rows, self._journal_offset = self._read_journal(offset)
+
+        # a crash between writing the snapshot and truncating the journal leaves entries that are already in the snapshot;
+        # entries past an offset were written after the columns were loaded, so they are always new
+        if offset == 0 and new_rows:
+            known_ids = set(columns.ids)
+            unseen = []
+            for tx in new_rows:
+                if tx['id'] not in known_ids:
+                    unseen.append(tx)
+                    known_ids.add(tx['id'])
+            new_rows = unseen
+
+        columns.extend(new_rows)
+        return len(new_rows)
+
+    def _read_journal(self, offset:int) -> tuple:
+        # the entries from offset on, and the offset after the last one
+        tx_list = []
+        with open(self.JOURNAL_FILE, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    tx_list.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # a torn final write from an interrupted add; everything before it is intact
+                    logging.warning('Ignoring unreadable journal entry in %s', self.JOURNAL_FILE)
+            return tx_list, f.tell()
+
+    def _journal_length(self) -> int:
+        if not self.JOURNAL_FILE.exists():
+            return 0
+
+        with open(self.JOURNAL_FILE, 'rb') as f:
+            return sum(1 for line in f if line.strip())
+
+
+class SqliteStorage:
+
+    # dates are stored as YYYY-MM-DD text, so year and month come straight out of the string
+    GROUP_COLUMNS = {
+        'year': 'CAST(substr(date, 1, 4) AS INTEGER)',
+        'month': 'CAST(substr(date, 6, 2) AS INTEGER)',
+        'type': 'type',
+        'category': 'category',
+    }
+
+    # the orders of select(), with ties broken like the JSON backend's date index does
+    ORDERS = {
+        None: 'id',
+        'newest': 'date DESC, id DESC',
+        'oldest': 'date, id',
+        'largest': 'cents DESC, date DESC, id DESC',
+        'smallest': 'cents, date DESC, id DESC',
+    }
+
+    TRANSACTIONS_SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY,
+            type TEXT NOT NULL,
+            date TEXT NOT NULL,
+            cents INTEGER NOT NULL,
+            category TEXT,
+            description TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_type ON transactions(type, date);
+        CREATE INDEX IF NOT EXISTS idx_transactions_category ON transactions(category, date);
+    '''
+
+    def __init__(self, base_dir:Path):
+        self.DB_FILE = base_dir / 'ledger.db'
+        self.ROLLUP_FILE = base_dir / 'ledger.aggregates.json'
+        self.CATEGORY_FILE = base_dir / 'ledger.categories.json'
+        self.CACHE_DIR = base_dir / 'ledger.cache'
+        self.SEARCH_FILE = base_dir / 'ledger.search.idx'
+        self.SPOOL_DIR = base_dir / 'ledger.pending'
+        # SQLite locks the database itself; this one guards the aggregates and the write spool
+        self.lock = LedgerLock(base_dir / 'ledger.lock')
+
+        # other writers hold the database only for the length of one commit, so waiting is cheap
+        self.conn = sqlite3.connect(self.DB_FILE, timeout=30)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript(self.TRANSACTIONS_SCHEMA + '''
+            CREATE TABLE IF NOT EXISTS budgets (
+                position INTEGER PRIMARY KEY,
+                start_date TEXT NOT NULL,
+                end_date TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        ''')
+
+        self._upgrade_amounts()
+        # the highest id as of the last changes() call
+        self._followed_id = None
+        logging.debug("Opened SQLite ledger %s", self.DB_FILE)
+
+    def load(self):
+        pass
+
+    def refresh(self):
+        # every query reads the database as it is now
+        pass
+
+    def stamp(self):
+        # bumped by every commit from another connection, budgets included
+        return self.conn.execute('PRAGMA data_version').fetchone()[0]
+
+    def budget_stamp(self):
+        # the budgets share the database, so any commit from another connection may have changed them
+        return self.stamp()
+
+    def changes(self):
+        # rows are never rewritten and ids only grow, so what is new is whatever comes after the last id seen
+        if self._followed_id is None:
+            self._followed_id = self.conn.execute('SELECT COALESCE(MAX(id), 0) FROM transactions').fetchone()[0]
+            return None
+
+        tx_list = [dict(row) for row in self.conn.execute('SELECT * FROM transactions WHERE id > ? ORDER BY id', (self._followed_id,))]
+        if tx_list:
+            self._followed_id = tx_list[-1]['id']
+        return tx_list
+
+    def count(self, **filters) -> int:
+        where, params = self._where(**filters)
+        with STATS.phase('filter'):
+            return self.conn.execute(f'SELECT COUNT(*) FROM transactions {where}', params).fetchone()[0]
+
+    def add_transactions(self, tx_list:list, defer=False):
+        if not self.conn.in_transaction:
+            # take the write lock before reading the counter, so no other writer can hand out the same ids
+            self.conn.execute('BEGIN IMMEDIATE')
+
+        # the counter only moves forward, so deleting the newest rows never frees their ids for reuse
+        next_id = self.conn.execute(
+            "SELECT MAX(COALESCE((SELECT value FROM counters WHERE name = 'next_id'), 1), COALESCE(MAX(id), 0) + 1) FROM transactions"
+        ).fetchone()[0]
+        for tx in tx_list:
+            if tx.get('id') is None:
+                tx['id'] = next_id
+            next_id = max(next_id, tx['id'] + 1)
+
+        self.conn.execute("INSERT OR REPLACE INTO counters (name, value) VALUES ('next_id', ?)", (next_id,))
+        self.conn.executemany(
+            'INSERT INTO transactions (id, type, date, cents, category, description) '
+            'VALUES (:id, :type, :date, :cents, :category, :description)',
+            tx_list
+        )
+        # deferred inserts are already visible on this connection and committed by the next flush()
+        if not defer:
+            self.flush()
+
+    def flush(self):
+        # SQLite syncs the WAL on commit
+        with STATS.phase('fsync'):
+            self.conn.commit()
+
+    def select(self, order=None, limit=None, offset=0, ids=None, **filters):
+        where, params = self._where(**filters)
+        if ids is not None:
+            # one parameter however many ids there are
+            where = f"{where} {'AND' if where else 'WHERE'} id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(ids)))
+
+        with STATS.phase('filter'):
+            # a LIMIT of -1 is no limit
+            cursor = self.conn.execute(f'SELECT * FROM transactions {where} ORDER BY {self.ORDERS[order]} LIMIT ? OFFSET ?',
+                                       params + [limit if limit is not None else -1, offset])
+
+        matched = 0
+        for row in cursor:
+            matched += 1
+            yield dict(row)
+        STATS.count('matched', matched)
+
+    def totals(self, group_by:tuple, **filters) -> dict:
+        return self._grouped(group_by, *self._where(**filters))
+
+    def slice_totals(self, group_by:tuple, part:int, parts:int) -> dict:
+        first, last = self.conn.execute('SELECT MIN(id), MAX(id) FROM transactions').fetchone()
+        if first is None:
+            return {}
+        span = last - first + 1
+        return self._grouped(group_by, 'WHERE id >= ? AND id < ?', [first + span * part // parts, first + span * (part + 1) // parts])
+
+    def _grouped(self, group_by:tuple, where:str, params:list) -> dict:
+        columns = [self.GROUP_COLUMNS[field] for field in group_by]
+        # groups come back in ledger order, like the JSON backend, so ties in "most common" resolve the same way
+        group = f"GROUP BY {', '.join(columns)} ORDER BY MIN(id)" if columns else ''
+
+        totals = {}
+        with STATS.phase('aggregate'):
+            for row in self.conn.execute(f"SELECT {', '.join(columns + ['SUM(cents)', 'COUNT(*)'])} FROM transactions {where} {group}", params):
+                row = tuple(row)
+                if row[-1]:
+                    totals[row[:-2]] = (row[-2], row[-1])
+
+        return totals
+
+    def for_worker(self):
+        # a connection must not cross a fork, so every scan worker opens its own
+        return SqliteStorage(self.DB_FILE.parent)
+
+    def compact(self):
+        logging.debug("Vacuuming %s", self.DB_FILE)
+        self.conn.commit()
+        self.conn.execute('VACUUM')
+
+    def load_budgets(self) -> dict:
+        rows = self.conn.execute('SELECT data FROM budgets ORDER BY position')
+        return {'budgets': [json.loads(row['data']) for row in rows]}
+
+    def save_budgets(self, budgets:dict):
+        with self.conn:
+            self.conn.execute('DELETE FROM budgets')
+            self.conn.executemany(
+                'INSERT INTO budgets (position, start_date, end_date, data) VALUES (?, ?, ?, ?)',
+                [(i, b['start_date'], b['end_date'], json.dumps(b)) for i, b in enumerate(budgets['budgets'])]
+            )
+
+    def _where(self, type=None, category=None, start=None, end=None, month=None, year=None):
+        clauses = []
+        params = []
+
+        if type:
+            clauses.append('type = ?')
+            params.append(type)
+
+        if category:
+            clauses.append('category = ?')
+            params.append(category)
+
+        if start:
+            clauses.append('date >= ?')
+            params.append(start.isoformat())
+
+        if end:
+            clauses.append('date <= ?')
+            params.append(end.isoformat())
+
+        # year (and month within a year) become date ranges so the date index can be used
+        if year and month:
+            clauses.append('date >= ? AND date <= ?')
+            params += [date(year, month, 1).isoformat(), date(year, month, calendar.monthrange(year, month)[1]).isoformat()]
+        elif year:
+            clauses.append('date >= ? AND date <= ?')
+            params += [f'{year:04d}-01-01', f'{year:04d}-12-31']
+        elif month:
+            clauses.append(f"{self.GROUP_COLUMNS['month']} = ?")
+            params.append(month)
+
+        return ('WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+    def _columns(self) -> set:
+        return {row['name'] for row in self.conn.execute('PRAGMA table_info(transactions)')}
+
+    def _upgrade_amounts(self):
+        # databases created before amounts were stored as cents have a REAL amount column instead
+        if 'amount' not in self._columns():
+            return
+
+        self.conn.execute('BEGIN IMMEDIATE')
+        # another process may have upgraded it while this one waited for the write lock
+        if 'amount' not in self._columns():
+            self.conn.rollback()
+            return
+
+        logging.info('Converting the amounts in %s to integer cents', self.DB_FILE)
+        # SQLite can't change a column's type, so the table is rebuilt. The indexes keep their names on the old table
+        # and go away with it, so the schema runs a second time to create them on the new one.
+        self.conn.execute('ALTER TABLE transactions RENAME TO transactions_float')
+        self._create_transactions()
+        self.conn.execute(
+            'INSERT INTO transactions (id, type, date, cents, category, description) '
+            'SELECT id, type, date, CAST(ROUND(amount * 100) AS INTEGER), category, description FROM transactions_float'
+        )
+        self.conn.execute('DROP TABLE transactions_float')
+        self._create_transactions()
+        self.conn.commit()
+
+    def _create_transactions(self):
+        # executescript() would commit the upgrade half way, so the statements run one at a time
+        for statement in self.TRANSACTIONS_SCHEMA.split(';'):
+            if statement.strip():
+                self.conn.execute(statement)
+
+
+# ================ BINARY LEDGER ================
+# An optional snapshot format for very large ledgers (--backend binary; migrate converts to and from it).
+# Instead of one JSON record per transaction, ledger.bin holds one fixed-width column per field (id, date ordinal,
+# year/month period, cents, type code, category code, and the start/length of the description in a string table),
+# plus the date index. It is opened with mmap: each column is copied into the tracker's arrays in one go, nothing is
+# parsed per record, and a description is only decoded from the mapping when its row is shown.
+# Adds go to a journal and are folded in on compaction exactly as with the JSON backend.
+#
+# Layout: magic, header length (4 bytes, little-endian), JSON header, then the blocks the header points at,
+# each starting on an 8-byte boundary. Offsets in the header are from the end of the padded header.
+
+LEDGER_MAGIC = b'FTLEDGR1'
+
+
+def write_blocks(file:Path, magic:bytes, header:dict, blocks:dict):
+    # blocks are arrays or bytes, written in the given order; the file is swapped in whole
+    layout = {}
+    offset = 0
+    for name, block in blocks.items():
+        size = len(block) * block.itemsize if isinstance(block, array) else len(block)
+        layout[name] = [offset, size]
+        offset = -(-(offset + size) // 8) * 8
+
+    encoded = json.dumps({**header, 'byteorder': sys.byteorder, 'blocks': layout}).encode()
+    base = -(-(len(magic) + 4 + len(encoded)) // 8) * 8
+
+    with tempfile.NamedTemporaryFile('wb', dir=file.parent, delete=False) as tmp:
+        tmp.write(magic + len(encoded).to_bytes(4, 'little') + encoded)
+        for name, block in blocks.items():
+            tmp.seek(base + layout[name][0])
+            if isinstance(block, array):
+                block.tofile(tmp)
+            else:
+                tmp.write(block)
+        temp_name = tmp.name
+
+    os.replace(temp_name, file)
+
+
+def map_blocks(file:Path, magic:bytes) -> tuple:
+    # (header, {block: memoryview}); the mapping stays valid after the file is closed, and after it is replaced
+    with open(file, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if data[:len(magic)] != magic:
+        raise ValueError(f'{file} was not written by the finance tracker')
+    header_end = len(magic) + 4 + int.from_bytes(data[len(magic):len(magic) + 4], 'little')
+    header = json.loads(data[len(magic) + 4:header_end])
+    base = -(-header_end // 8) * 8
+
+    view = memoryview(data)
+    return header, {name: view[base + offset:base + offset + size] for name, (offset, size) in header['blocks'].items()}
+
+
+class MappedStrings:
+
+    def __init__(self, data:memoryview, starts, lengths):
+        # starts are relative to the string table in data
+        self._data = data
+        self._starts = starts
+        self._lengths = lengths
+        # descriptions of rows added after the snapshot was mapped
+        self._tail = []
+
+    def __len__(self):
+        return len(self._starts) + len(self._tail)
+
+    def __getitem__(self, i):
+        if i >= len(self._starts):
+            return self._tail[i - len(self._starts)]
+
+        start = self._starts[i]
+        if start < 0:
+            return None
+        return str(self._data[start:start + self._lengths[i]], 'utf-8')
+
+    def append(self, description):
+        self._tail.append(description)
+
+
+class BinaryStorage(JsonStorage):
+
+    # (block, array typecode), in file order
+    BLOCKS = (('ids', 'q'), ('ordinals', 'i'), ('periods', 'i'), ('cents', 'q'), ('types', 'b'), ('categories', 'i'),
+              ('description_starts', 'q'), ('description_lengths', 'i'), ('order', 'q'), ('sorted_ordinals', 'i'))
+
+    def __init__(self, base_dir:Path):
+        super().__init__(base_dir)
+        # its own files, budgets included, so a JSON ledger in the same directory is left alone
+        self.TRANSACTION_FILE = base_dir / 'ledger.bin'
+        self.BUDGET_FILE = base_dir / 'ledger.bin.budgets.json'
+        self.JOURNAL_FILE = base_dir / 'ledger.bin.journal'
+        self.META_FILE = base_dir / 'ledger.bin.meta.json'
+        self.ROLLUP_FILE = base_dir / 'ledger.bin.aggregates.json'
+        self.CATEGORY_FILE = base_dir / 'ledger.bin.categories.json'
+        self.CACHE_DIR = base_dir / 'ledger.bin.cache'
+        self.SEARCH_FILE = base_dir / 'ledger.bin.search.idx'
+        self.SPOOL_DIR = base_dir / 'ledger.bin.pending'
+
+    def _read_snapshot(self, columns:TransactionColumns):
+        with STATS.phase('load'):
+            header, blocks = map_blocks(self.TRANSACTION_FILE, LEDGER_MAGIC)
+            arrays = {}
+            for name, typecode in self.BLOCKS:
+                values = array(typecode)
+                if len(blocks[name]) % values.itemsize:
+                    raise ValueError(f'{self.TRANSACTION_FILE} was written with a different {name} width')
+                values.frombytes(blocks[name])
+                if header['byteorder'] != sys.byteorder:
+                    values.byteswap()
+                arrays[name] = values
+
+        strings = MappedStrings(blocks['strings'], arrays.pop('description_starts'), arrays.pop('description_lengths'))
+        columns.from_arrays(arrays, header['categories'], strings)
+
+    def _write_snapshot(self):
+        columns = self.columns
+        logging.debug("Saving %s transactions to %s", len(columns), self.TRANSACTION_FILE)
+
+        with STATS.phase('serialize'):
+            blocks = columns.to_arrays()
+
+            # repeated descriptions are stored once
+            strings = bytearray()
+            starts, lengths = array('q'), array('i')
+            stored = {None: (-1, 0)}
+            descriptions = columns.descriptions
+            for i in range(len(columns)):
+                description = descriptions[i]
+                entry = stored.get(description)
+                if entry is None:
+                    encoded = description.encode()
+                    entry = stored[description] = (len(strings), len(encoded))
+                    strings += encoded
+                starts.append(entry[0])
+                lengths.append(entry[1])
+            blocks['description_starts'] = starts
+            blocks['description_lengths'] = lengths
+
+            # categories as positions in the registry's list, like transactions.json
+            names, codes = self._category_table()
+            if codes != list(range(len(codes))):
+                blocks['categories'] = array('i', map(codes.__getitem__, blocks['categories']))
+
+            blocks = {name: blocks[name] for name, _ in self.BLOCKS}
+            blocks['strings'] = strings
+            write_blocks(self.TRANSACTION_FILE, LEDGER_MAGIC, {'count': len(columns), 'categories': names}, blocks)
+
+
+# ================ MONTHLY AGGREGATES ================
+# Totals and counts per (year, month, type, category), persisted next to the ledger and updated on every add.
+# Reports over whole months read these instead of scanning transactions. The rollup remembers how many
+# transactions it has seen; if that disagrees with the ledger it is rebuilt from a full scan.
+
+class Rollup:
+
+    FIELDS = ('year', 'month', 'type', 'category')
+
+    def __init__(self, file:Path):
+        self.FILE = file
+        self._rows = None
+        # rows added with save=False that are not on disk yet
+        self.dirty = False
+        # a missing file is an empty rollup: correct for an empty ledger, stale for anything else
+        self.count = 0
+        # period -> [(position in rows, key)], so a bounded query only visits the months it asks about
+        self._periods = None
+
+    @property
+    def rows(self) -> dict:
+        if self._rows is None:
+            self._rows = {}
+            if self.FILE.exists():
+                with STATS.phase('load'), open(self.FILE, 'r') as f:
+                    data = json.load(f)
+                self.count = data['count']
+                for year, month, tx_type, category, cents, count in data['rows']:
+                    self._rows[(year, month, tx_type, category)] = [cents, count]
+
+            logging.debug("Loaded %s aggregate rows from %s", len(self._rows), self.FILE)
+
+        return self._rows
+
+    def reload(self):
+        # drop what was read so the next access sees what other processes saved
+        self._rows = None
+        self._periods = None
+        self.count = 0
+
+    def is_current(self, ledger_count:int) -> bool:
+        self.rows
+        return self.count == ledger_count
+
+    def add(self, tx_list:list, save=True):
+        rows = self.rows
+        for tx in tx_list:
+            tx_date = parse_date(tx['date'])
+            key = (tx_date.year, tx_date.month, tx['type'], tx['category'])
+            entry = rows.get(key)
+            if entry is None:
+                entry = rows[key] = [0, 0]
+                if self._periods is not None:
+                    self._periods[tx_date.year * 12 + tx_date.month - 1].append((len(rows) - 1, key))
+            entry[0] += tx['cents']
+            entry[1] += 1
+
+        self.count += len(tx_list)
+        self.dirty = True
+        if save:
+            self.save()
+
+    def follow(self, tx_list:list):
+        # rows another process added, and already saved to the file: only this copy is behind
+        self.add(tx_list, save=False)
+        self.dirty = False
+
+    def rebuild(self, storage, workers:int = 1):
+        totals = partitioned_totals(storage, self.FIELDS, workers) if workers > 1 else storage.totals(self.FIELDS)
+        self._rows = {key: [cents, count] for key, (cents, count) in totals.items()}
+        self._periods = None
+        self.count = sum(count for _, count in self._rows.values())
+        self.save()
+
+    def save(self):
+        self.dirty = False
+        logging.debug("Saving %s aggregate rows to %s", len(self._rows), self.FILE)
+        save_json(self.FILE, {'count': self.count, 'rows': [[*key, *value] for key, value in self._rows.items()]})
+
+    def covers(self, start=None, end=None) -> bool:
+        # monthly totals can only answer date ranges made of whole months
+        if start and start.day != 1:
+            return False
+        if end and end.day != calendar.monthrange(end.year, end.month)[1]:
+            return False
+        return True
+
+    def totals(self, group_by:tuple, type=None, category=None, start=None, end=None, month=None, year=None) -> dict:
+        lo = start.year * 12 + start.month - 1 if start else None
+        hi = end.year * 12 + end.month - 1 if end else None
+        positions = [self.FIELDS.index(field) for field in group_by]
+
+        if year:
+            lo = max(lo, year * 12) if lo is not None else year * 12
+            hi = min(hi, year * 12 + 11) if hi is not None else year * 12 + 11
+
+        with STATS.phase('aggregate'):
+            items = self._between(lo, hi) if lo is not None and hi is not None else self.rows.items()
+            totals = self._totals(items, positions, type, category, month, year, lo, hi)
+
+        if STATS.enabled:
+            STATS.count('rollup_scanned', len(items))
+            STATS.count('rollup_matched', sum(count for _, count in totals.values()))
+        return {k: tuple(v) for k, v in totals.items()}
+
+    def has(self, tx_type:str) -> bool:
+        return any(key[2] == tx_type for key in self.rows)
+
+    def _between(self, lo:int, hi:int) -> list:
+        rows = self.rows
+        if self._periods is None:
+            self._periods = defaultdict(list)
+            for position, key in enumerate(rows):
+                self._periods[key[0] * 12 + key[1] - 1].append((position, key))
+
+        periods = self._periods
+        wanted = range(lo, hi + 1) if hi - lo < len(periods) else [p for p in periods if lo <= p <= hi]
+        found = [entry for period in wanted if period in periods for entry in periods[period]]
+        # back in the order of the rows, so the groups come out exactly as a full pass would give them
+        found.sort()
+        return [(key, rows[key]) for _, key in found]
+
+    def _totals(self, items, positions:list, type, category, month, year, lo, hi) -> dict:
+        totals = defaultdict(lambda: [0, 0])
+        for key, (cents, count) in items:
+            row_year, row_month, row_type, row_category = key
+
+            if type and row_type != type:
+                continue
+            if category and row_category != category:
+                continue
+            if year and row_year != year:
+                continue
+            if month and row_month != month:
+                continue
+            if lo is not None and row_year * 12 + row_month - 1 < lo:
+                continue
+            if hi is not None and row_year * 12 + row_month - 1 > hi:
+                continue
+
+            entry = totals[tuple(key[p] for p in positions)]
+            entry[0] += cents
+            entry[1] += count
+
+        return totals
+
+
+# ================ CATEGORY REGISTRY ================
+# Every category name the ledger uses, persisted next to it; a category's id is its position counting from 1, and names
+# are only ever appended. Lookups ignore case: a transaction, budget or filter spelled "groceries" is taken as the "Groceries" already
+# registered, so new rows never split one category in two. The exact spelling is tried first, so an old ledger that
+# already has both spellings can still ask for either. A missing file is derived from the ledger once.
+
+class CategoryRegistry:
+
+    def __init__(self, file:Path):
+        self.FILE = file
+        self._names = None
+        self._ids = None
+        self._folded = None
+        self.exists = False
+
+    @property
+    def names(self) -> list:
+        if self._names is None:
+            names = []
+            self.exists = self.FILE.exists()
+            if self.exists:
+                with open(self.FILE, 'r') as f:
+                    names = json.load(f)['categories']
+            self._index(names)
+        return self._names
+
+    def reload(self):
+        self._names = None
+
+    def id(self, name:str):
+        self.names
+        return self._ids.get(name)
+
+    def lookup(self, name:str):
+        # the registered spelling of name, or None if it is new
+        self.names
+        if name in self._ids:
+            return name
+        position = self._folded.get(name.casefold())
+        return None if position is None else self._names[position]
+
+    def resolve(self, name):
+        # for filters and budgets: an unknown name is kept as typed, and simply matches nothing
+        if not name:
+            return name
+        return self.lookup(name) or name
+
+    def register(self, tx_list:list):
+        # puts every transaction's category in its registered spelling; the caller holds the ledger lock
+        added = False
+        for tx in tx_list:
+            category = self.lookup(tx['category'])
+            if category is None:
+                category = tx['category']
+                self._add(category)
+                added = True
+            tx['category'] = category
+
+        if added:
+            self.save()
+
+    def add(self, name:str) -> str:
+        # the registered spelling of name, registering it if it is new (a budget); the caller holds the ledger lock
+        category = self.lookup(name)
+        if category is None:
+            category = name
+            self._add(category)
+            self.save()
+        return category
+
+    def include(self, names):
+        # registers each of names exactly as spelled unless it already is; for names taken from the ledger itself
+        missing = [name for name in names if self.id(name) is None]
+        for name in missing:
+            self._add(name)
+        if missing:
+            self.save()
+
+    def rebuild(self, names):
+        self._index([])
+        for name in names:
+            if name not in self._ids:
+                self._add(name)
+        self.save()
+
+    def save(self):
+        logging.debug("Saving %s categories to %s", len(self._names), self.FILE)
+        save_json(self.FILE, {'categories': self._names})
+        self.exists = True
+
+    def _index(self, names:list):
+        self._names = []
+        self._ids = {}
+        self._folded = {}
+        for name in names:
+            self._add(name)
+
+    def _add(self, name:str):
+        self._ids[name] = len(self._names) + 1
+        # the first spelling registered is the one every other case folds to
+        self._folded.setdefault(name.casefold(), len(self._names))
+        self._names.append(name)
+
+
+# ================ RESULT CACHE ================
+# Report output and export files are kept on disk, keyed by what was asked and by the version of every month the result
+# covers. Each add bumps the versions of the months its transactions fall in, so a write only invalidates results that
+# include those months: a report on a past year stays cached while this month's transactions come in. A hit touches the
+# entry, and once the directory is over its size cap the least recently used entries go first.
+# Keys are computed from the versions as they were before the process read any data (pin(): at start-up, and again on
+# every refresh in the daemon and in watch mode). A write landing between that and the read can then only leave a
+# result stored under a key older than its data, which nobody asks for any more; never under a key newer than its data.
+# Versions are only kept once the versions file exists; the first cacheable command creates it and caches nothing.
+# The daemon bumps the versions of deferred adds when it flushes them, and doesn't cache results covering them before.
+
+def month_period(value:str) -> str:
+    # 'YYYY-MM' of a transaction date
+    tx_date = parse_date(value)
+    return f'{tx_date.year:04d}-{tx_date.month:02d}'
+
+
+def period_bounds(start=None, end=None, month=None, year=None) -> tuple:
+    # the first and last month ('YYYY-MM') the date filters can match; None for an open end
+    lo = f'{start.year:04d}-{start.month:02d}' if start else None
+    hi = f'{end.year:04d}-{end.month:02d}' if end else None
+
+    if year:
+        first, last = (f'{year:04d}-{month:02d}',) * 2 if month else (f'{year:04d}-01', f'{year:04d}-12')
+        lo = max(lo, first) if lo else first
+        hi = min(hi, last) if hi else last
+
+    return lo, hi
+
+
+class ResultCache:
+
+    def __init__(self, directory:Path, lock:LedgerLock, max_bytes:int):
+        self.DIR = directory
+        self.VERSIONS_FILE = directory / 'versions.json'
+        self.lock = lock
+        self.max_bytes = max_bytes
+        self.pin()
+
+    def pin(self):
+        # call before reading data that results will be computed from
+        self._pinned = self._versions() if self.max_bytes and self.VERSIONS_FILE.exists() else None
+
+    def key(self, query:dict, lo=None, hi=None):
+        # None when nothing may be cached
+        if not self.max_bytes:
+            return None
+
+        if self._pinned is None:
+            # writes before the file existed weren't counted, so this process's data can't be keyed yet
+            with self.lock.hold():
+                if not self.VERSIONS_FILE.exists():
+                    self.DIR.mkdir(exist_ok=True)
+                    save_json(self.VERSIONS_FILE, {'epoch': 0, 'periods': {}})
+            return None
+
+        versions = self._pinned
+        periods = sorted((p, v) for p, v in versions['periods'].items() if (lo is None or p >= lo) and (hi is None or p <= hi))
+        raw = json.dumps([versions['epoch'], query, periods], sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key):
+        if key is None:
+            return None
+
+        entry = self.DIR / f'{key}.entry'
+        try:
+            data = entry.read_bytes()
+            # the mtime is the LRU clock
+            os.utime(entry)
+        except FileNotFoundError:
+            return None
+
+        STATS.count('cache_hits')
+        logging.debug("Result cache hit %s", entry.name)
+        return data
+
+    def put(self, key, data:bytes):
+        # results bigger than a quarter of the cap would only push everything else out
+        if key is None or len(data) > self.max_bytes // 4:
+            return
+
+        with tempfile.NamedTemporaryFile('wb', dir=self.DIR, delete=False) as tmp:
+            tmp.write(data)
+            temp_name = tmp.name
+        os.replace(temp_name, self.DIR / f'{key}.entry')
+        self._evict()
+
+    def touch(self, tx_list:list):
+        # writers call this under the ledger lock; nothing to do until something was cached
+        if not self.VERSIONS_FILE.exists():
+            return
+
+        versions = self._versions()
+        periods = versions['periods']
+        for period in {month_period(tx['date']) for tx in tx_list}:
+            periods[period] = periods.get(period, 0) + 1
+
+        save_json(self.VERSIONS_FILE, versions)
+
+    def clear(self):
+        # for changes that don't go through touch(): every key changes and the entries are dropped
+        if not self.VERSIONS_FILE.exists():
+            return
+
+        with self.lock.hold():
+            versions = self._versions()
+            versions['epoch'] += 1
+            save_json(self.VERSIONS_FILE, versions)
+            for entry in self.DIR.glob('*.entry'):
+                entry.unlink(missing_ok=True)
+            # whoever cleared it has just recomputed what it needs
+            self.pin()
+
+    def _versions(self) -> dict:
+        with open(self.VERSIONS_FILE, 'r') as f:
+            return json.load(f)
+
+    def _evict(self):
+        entries = []
+        for entry in self.DIR.glob('*.entry'):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime_ns, st.st_size, entry))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logging.debug("Evicting %s from the result cache", entry.name)
+            entry.unlink(missing_ok=True)
+            total -= size
 
-        logging.debug(f"FinanceTracker initialized. BASE_DIR={self.BASE_DIR}")
-        logging.debug(f"Loaded {len(self.transactions.get('transactions', []))} transactions and {len(self.budgets.get('budgets', []))} budgets")
 
-        # similarly I could use self.transactions = self.TRANSACTION_FILE.open('r') as f using the pathlib module
-        # or I could use self.transactions = json.loads(self.TRANSACTION_FILE.read_text())
+# ================ SEARCH INDEX ================
+# `search` finds transactions by the words in their description and category without looking at every row.
+# An inverted index maps each word (casefolded; anything that isn't a letter or digit separates words) to the sorted
+# ids of the transactions using it. It is a file in the binary ledger's block layout, opened with mmap: the sorted
+# word list is searched with bisect and only the id lists of the words asked for are read, so a query costs about
+# the same on any ledger size. The words starting with a prefix are neighbours in that list, so "groc*" is one run.
+# Adds don't rewrite the file: writers append each new transaction's words to a tail file, which queries scan too,
+# and a search folds the tail in once it holds SEARCH_TAIL_THRESHOLD transactions.
+# Like the aggregates, the index is derived data: it is built by the first search, and rebuilt whenever it doesn't
+# cover exactly as many transactions as the ledger holds.
+
+SEARCH_MAGIC = b'FTSRCH01'
+
+# transactions in the tail after which a search folds them into the index file
+SEARCH_TAIL_THRESHOLD = 1000
+
+SEARCH_WORDS = re.compile(r'\w+')
+
+
+def search_words(*texts) -> set:
+    words = set()
+    for text in texts:
+        if text:
+            words.update(SEARCH_WORDS.findall(text.casefold()))
+    return words
+
+
+def search_query(terms:list) -> list:
+    # (word, is_prefix) pairs from the command line; a term ending in * matches every word starting with its last word
+    query = []
+    for term in terms:
+        words = SEARCH_WORDS.findall(term.casefold())
+        query += [(word, False) for word in words]
+        if words and term.endswith('*'):
+            query[-1] = (words[-1], True)
+    return query
+
+
+class SearchIndex:
+
+    def __init__(self, file:Path):
+        self.FILE = file
+        self.TAIL_FILE = file.with_name(file.name + '.tail')
+        self.reload()
+
+    def reload(self):
+        self._header = None
+        self._tail = None
+
+    def count(self):
+        # transactions covered by the file and the tail, or None if there is no usable index
+        self._load()
+        return self._header['count'] + len(self._tail) if self._header else None
+
+    def tail_size(self) -> int:
+        self._load()
+        return len(self._tail)
+
+    def add(self, tx_list:list):
+        # writers call this under the ledger lock; until the first search builds the index there is nothing to keep up to date
+        if not self.FILE.exists():
+            return
+        with open(self.TAIL_FILE, 'a') as f:
+            f.write(''.join(json.dumps([tx['id'], sorted(search_words(tx['category'], tx.get('description')))]) + '\n' for tx in tx_list))
+        self.reload()
+
+    def build(self, transactions):
+        # from every transaction in the ledger; the caller holds the ledger lock
+        postings = defaultdict(list)
+        count = 0
+        with STATS.phase('index'):
+            for tx in transactions:
+                count += 1
+                for word in search_words(tx['category'], tx['description']):
+                    postings[word].append(tx['id'])
+            for ids in postings.values():
+                # already sorted when the ledger is in id order, which makes this a single pass
+                ids.sort()
+        self._write(postings, count)
+
+    def fold(self):
+        # the tail merged into the file; the caller holds the ledger lock
+        count = self.count()
+        terms, starts, raw = self._terms, self._starts, self._raw
+
+        with STATS.phase('index'):
+            postings = {}
+            for i in range(len(terms)):
+                ids = array('q')
+                ids.frombytes(raw[starts[i] * ids.itemsize:starts[i + 1] * ids.itemsize])
+                postings[terms[i]] = ids
+
+            unsorted = set()
+            for tx_id, words in self._tail:
+                for word in words:
+                    ids = postings.get(word)
+                    if ids is None:
+                        postings[word] = array('q', [tx_id])
+                    else:
+                        if tx_id <= ids[-1]:
+                            unsorted.add(word)
+                        ids.append(tx_id)
+            for word in unsorted:
+                postings[word] = array('q', sorted(set(postings[word])))
+
+        self._write(postings, count)
+
+    def lookup(self, query:list) -> set:
+        # ids of the transactions having every word of the query (see search_query)
+        self._load()
+        matches = []
+        for word, prefix in query:
+            first, last = self._range(word, prefix)
+            postings = self._postings[self._starts[first]:self._starts[last]] if self._header else []
+            if prefix:
+                in_tail = {tx_id for tx_id, words in self._tail if any(w.startswith(word) for w in words)}
+            else:
+                in_tail = {tx_id for tx_id, words in self._tail if word in words}
+            # a single word's ids are sorted; a prefix run is several sorted lists back to back
+            matches.append((postings, last - first == 1, in_tail))
+
+        # the rarest word first, so the others only have to confirm its few ids
+        matches.sort(key=lambda m: len(m[0]) + len(m[2]))
+        ids = None
+        for postings, single, in_tail in matches:
+            if ids is None:
+                ids = set(postings) | in_tail
+            elif single and len(ids) * 16 < len(postings):
+                ids = {tx_id for tx_id in ids if tx_id in in_tail or _sorted_contains(postings, tx_id)}
+            else:
+                ids &= set(postings) | in_tail
+            if not ids:
+                break
+        return ids or set()
+
+    def _range(self, word:str, prefix:bool) -> tuple:
+        # positions [first, last) of the words in the sorted word list that match
+        terms = self._terms
+        if terms is None:
+            return 0, 0
+        first = bisect_left(terms, word)
+        if prefix:
+            # everything from the prefix up to the prefix with its last character bumped
+            return first, bisect_left(terms, word[:-1] + chr(ord(word[-1]) + 1), first)
+        return first, first + 1 if first < len(terms) and terms[first] == word else first
+
+    def _load(self):
+        if self._tail is not None:
+            return
+
+        self._header = self._terms = None
+        if self.FILE.exists():
+            header, blocks = map_blocks(self.FILE, SEARCH_MAGIC)
+            # an index from a machine with the other byte order is rebuilt rather than converted
+            if header['byteorder'] == sys.byteorder:
+                self._header = header
+                # zero-copy views of the mapping; nothing is read until a query touches it
+                self._terms = MappedStrings(blocks['terms'], blocks['term_starts'].cast('q'), blocks['term_lengths'].cast('i'))
+                self._starts = blocks['posting_starts'].cast('q')
+                self._postings = blocks['postings'].cast('q')
+                self._raw = blocks['postings']
+
+        self._tail = []
+        if self._header and self.TAIL_FILE.exists():
+            with open(self.TAIL_FILE, 'r') as f:
+                for line in f:
+                    try:
+                        tx_id, words = json.loads(line)
+                    except ValueError:
+                        # a torn last line; the count check notices and the index gets rebuilt
+                        break
+                    self._tail.append((tx_id, set(words)))
+
+    def _write(self, postings:dict, count:int):
+        with STATS.phase('serialize'):
+            terms = bytearray()
+            term_starts, term_lengths = array('q'), array('i')
+            posting_starts, ids = array('q', [0]), array('q')
+            for word in sorted(postings):
+                encoded = word.encode()
+                term_starts.append(len(terms))
+                term_lengths.append(len(encoded))
+                terms += encoded
+                ids.extend(postings[word])
+                posting_starts.append(len(ids))
+
+            write_blocks(self.FILE, SEARCH_MAGIC, {'count': count}, {
+                'terms': terms, 'term_starts': term_starts, 'term_lengths': term_lengths,
+                'posting_starts': posting_starts, 'postings': ids,
+            })
+
+        # everything in the tail is in the file now
+        self.TAIL_FILE.unlink(missing_ok=True)
+        self.reload()
+
+
+def _sorted_contains(values, value) -> bool:
+    i = bisect_left(values, value)
+    return i < len(values) and values[i] == value
+
+
+# ================ BUDGET INDEX ================
+# Budgets stay a list on disk, newest first. In memory they are indexed by (year, month) for budget set, and by
+# start date for the overlap queries behind budget status: every budget that can overlap [lo, hi] starts between
+# lo minus the longest budget and hi, which two bisects find. Built once per command and dropped on any change.
+
+# keys of a budget that are not category limits
+BUDGET_FIELDS = ('id', 'start_date', 'end_date', 'total')
+
+
+class BudgetIndex:
+
+    def __init__(self, budgets:list):
+        self.budgets = budgets
+        self.by_month = {}
+        entries = []
+
+        for position, b in enumerate(budgets):
+            start = parse_date(b['start_date'])
+            end = parse_date(b['end_date'])
+            # budget set only ever matches a budget starting on the 1st; the newest one wins, as in a scan from the top
+            if start.day == 1:
+                self.by_month.setdefault((start.year, start.month), b)
+            entries.append((start.toordinal(), end.toordinal(), position))
+
+        entries.sort()
+        self._entries = entries
+        self._starts = [start for start, _, _ in entries]
+        self._longest = max((end - start for start, end, _ in entries), default=0)
+
+    def overlapping(self, start=None, end=None) -> list:
+        lo = start.toordinal() if start else None
+        hi = end.toordinal() if end else None
+
+        first = bisect_left(self._starts, lo - self._longest) if lo is not None else 0
+        last = bisect_right(self._starts, hi) if hi is not None else len(self._starts)
+        positions = sorted(position for _, budget_end, position in self._entries[first:last] if lo is None or budget_end >= lo)
+
+        # in stored order, newest first
+        return [self.budgets[position] for position in positions]
+
+
+STORAGE_BACKENDS = {
+    'json': JsonStorage,
+    'sqlite': SqliteStorage,
+    'binary': BinaryStorage,
+}
+
+
+# ================ PARALLEL SCANS ================
+# A full scan (rebuilding the monthly aggregates) can be split into contiguous slices of the ledger, one per worker
+# process. Workers are forked after the ledger is loaded, so the JSON columns are shared copy-on-write instead of being
+# re-read or pickled, and only the small per-slice totals travel back. Merging the slices in ledger order keeps every
+# group where a single scan would have put it, so ties in "most common" resolve the same way with any worker count.
+# Where fork is not available the slices run one after another in this process.
+
+_scan_storage = None
+
+
+def _init_scan_worker():
+    global _scan_storage
+    _scan_storage = _scan_storage.for_worker()
+
+
+def _scan_slice(group_by:tuple, part:int, parts:int) -> dict:
+    return _scan_storage.slice_totals(group_by, part, parts)
+
+
+def partitioned_totals(storage, group_by:tuple, workers:int) -> dict:
+    global _scan_storage
+
+    import multiprocessing
+    if 'fork' in multiprocessing.get_all_start_methods():
+        from concurrent.futures import ProcessPoolExecutor
+
+        # loaded before the fork, so no worker has to do it again
+        storage.load()
+        _scan_storage = storage
+        try:
+            with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('fork'), initializer=_init_scan_worker) as pool:
+                # map() hands the results back in slice order, whatever order the workers finish in
+                slices = list(pool.map(_scan_slice, [group_by] * workers, range(workers), [workers] * workers))
+        finally:
+            _scan_storage = None
+    else:
+        slices = [storage.slice_totals(group_by, part, workers) for part in range(workers)]
+
+    totals = {}
+    for slice_totals in slices:
+        for key, (cents, count) in slice_totals.items():
+            before = totals.get(key, (0, 0))
+            totals[key] = (before[0] + cents, before[1] + count)
+    return totals
+
+
+class FinanceTracker:
+
+    def __init__(self, base_dir = None, backend = 'json', group_commit = False, cache_size = CACHE_SIZE_MB):
+
+        self.BASE_DIR = resolve_base_dir(base_dir)
+        self.backend = backend
+
+        self.BASE_DIR.mkdir(parents=True, exist_ok=True)
+
+        self.storage = STORAGE_BACKENDS[backend](self.BASE_DIR)
+        self.rollup = Rollup(self.storage.ROLLUP_FILE)
+        self.categories = CategoryRegistry(self.storage.CATEGORY_FILE)
+        self.cache = ResultCache(self.storage.CACHE_DIR, self.storage.lock, int(cache_size * 1024 * 1024))
+        self.search_index = SearchIndex(self.storage.SEARCH_FILE)
+        self._budgets = None
+        self._budget_index = None
+        # what the budgets were read from; they and their index are kept until another process changes them
+        self._budgets_stamp = None
+        # with group commit, adds from concurrent processes are merged into one save
+        self.spool = WriteSpool(self.storage.SPOOL_DIR) if group_commit else None
+
+        # set by the daemon: adds are buffered until flush(), and nobody is at a terminal to answer prompts
+        self.defer_writes = False
+        # deferred adds whose months the result cache hasn't been told about yet
+        self._unflushed = []
+        self.interactive = True
+
+        logging.debug("FinanceTracker initialized. BASE_DIR=%s backend=%s", self.BASE_DIR, backend)
+
+    @property
+    def budgets(self) -> dict:
+        # budgets are only read by the budget commands
+        if self._budgets is None:
+            # taken first, so a change made while they are read is picked up next time rather than missed
+            self._budgets_stamp = self.storage.budget_stamp()
+            self._budgets = self.storage.load_budgets()
+            logging.debug("Loaded %s budgets", len(self._budgets.get('budgets', [])))
+        return self._budgets
+
+    @property
+    def budget_index(self) -> BudgetIndex:
+        if self._budget_index is None:
+            self._budget_index = BudgetIndex(self.budgets['budgets'])
+        return self._budget_index
 
     def add_expense(self, args):
-        id = len(self.transactions['transactions']) + 1
         date = args.date if args.date else datetime.now().strftime('%Y-%m-%d')
 
         expense = {
-            'id': id,
+            # the storage hands out the id when it writes the transaction
+            'id': None,
             'type' : 'expense',
             'date': date,
-            'amount': round(args.amount, 2),
+            'cents': args.cents,
             'category': args.category,
             'description': args.description,
         }
-        logging.debug(f"Adding expense: {expense}")
-        self.transactions['transactions'].insert(0, expense)
-        self._save('transaction', self.transactions)
+        logging.debug("Adding expense: %s", expense)
+        self._record([expense])
 
     def add_income(self, args):
-        id = len(self.transactions['transactions']) + 1
         date = args.date if args.date else datetime.now().strftime('%Y-%m-%d')
 
         income = {
-            'id': id,
+            'id': None,
             'type' : 'income',
             'date': date,
-            'amount': round(args.amount, 2),
+            'cents': args.cents,
             'category': args.category,
             'description': args.description
         }
 
-        logging.debug(f"Adding income: {income}")
-        self.transactions['transactions'].insert(0, income)
-        self._save('transaction', self.transactions)
+        logging.debug("Adding income: %s", income)
+        self._record([income])
 
     def list_transactions(self, args):
 
-        transaction_list = self.transactions['transactions']
-        logging.debug(f"Listing transactions - total available: {len(transaction_list)}")
-        if not transaction_list:
+        total = self.storage.count()
+        logging.debug("Listing transactions - total available: %s", total)
+        if not total:
             print('You have no transactions')
             return False
 
-        filtered_list = []
+        if not self._valid_page(args):
+            return False
+
+        filters = self._filters(args)
 
-        filters = vars(args)
-        filters = {k: v for k, v in filters.items() if v and not k in ['commands', 'start_date', 'end_date', 'func'] }
+        logging.debug("Applied filters: %s, order: %s, limit: %s, offset: %s", filters, args.sort, args.limit, args.offset)
 
-        logging.debug(f"Applied filters: {filters}")
+        # the backend filters, orders and cuts out the page, so nothing is re-sorted here and rows are written as they come
+        transactions = self.storage.select(order=args.sort, limit=args.limit, offset=args.offset, **filters)
+        self._print_page(transactions, args, 'No transaction matches these filters')
 
-        for transaction in transaction_list:
-            match = True
-            tx_date = self._parse_date(transaction.get('date'))
+    def search(self, args):
+        query = search_query(args.terms)
+        if not query:
+            print('Give at least one word to search for')
+            return False
 
-            for key, value in filters.items():
-                if transaction[key] != value:
-                    match = False
-                    break
+        total = self.storage.count()
+        if not total:
+            print('You have no transactions')
+            return False
+
+        if not self._valid_page(args):
+            return False
 
-            if self._date_filter(args, tx_date) and match:
-                filtered_list.append(transaction)
+        filters = self._filters(args)
+        with STATS.phase('search'):
+            ids = self._current_index().lookup(query)
+        logging.debug("Search %s: %s transactions have every word, filters: %s", query, len(ids), filters)
 
-            # FASTER ALTERNATIVE PROPOSED BY AI: if all(transaction.get(k) == v for k, v in filters.items()) and self._within_range(args, tx_date): filtered_list.append(transaction)
-            # EVEN FASTER: filtered_list = [ tx for tx in transaction_list if self._date_filter(args, tx_date) and all(tx.get(k) == v for k, v in filters.items()]
+        # the other filters and the order are applied to those rows only
+        transactions = self.storage.select(order=args.sort, limit=args.limit, offset=args.offset, ids=ids, **filters) if ids else []
+        self._print_page(transactions, args, 'No transaction matches this search')
 
-        sorted_transactions = sorted(filtered_list, key=lambda x: self._parse_date(x.get('date')), reverse=True)
+    def _valid_page(self, args) -> bool:
+        if (args.limit is not None and args.limit < 1) or args.offset < 0:
+            print('--limit must be at least 1 and --offset cannot be negative')
+            return False
+        return True
 
-        logging.debug(f"Filtered transactions count: {len(sorted_transactions)}")
+    def _print_page(self, transactions, args, nothing:str):
         print()
-        if sorted_transactions:
-            for transaction in sorted_transactions:
-                for k, v in transaction.items():
-                    print(f'{k}: {v}')
-                print('-' * 30)
-        else:
-            print('No transaction matches these filters')
+        with STATS.phase('serialize'):
+            shown = self._write_transactions(transactions, args.table)
+
+        logging.debug("Listed %s transactions", shown)
+        if not shown:
+            print(nothing)
+        elif shown == args.limit:
+            print(f'Next page: --offset {args.offset + shown}')
 
     def generate_report(self, args):
-        transaction_list = self.transactions['transactions']
         month = getattr(args, 'month', None)
-        year = args.year
-
-        logging.debug(f"Generating report - month: {month}, year: {year}, total_transactions: {len(transaction_list)}")
+        query = {'report': 'monthly' if month else 'yearly', 'year': args.year, 'month': month}
+        self._cached(query, period_bounds(year=args.year, month=month), self._generate_report, args)
 
-        tx_in_month = []
-        tx_in_year = []
-
-        for tx in transaction_list:
-            date = self._parse_date(tx.get('date'))
+    def _generate_report(self, args):
+        month = getattr(args, 'month', None)
+        year = args.year
 
-            if month and date.month == month and date.year == year:
-                tx_in_month.append(tx)
+        logging.debug("Generating report - month: %s, year: %s", month, year)
 
-            elif date.year == year:
-                tx_in_year.append(tx)
+        # one grouped query gives both the overall report and the monthly breakdown
+        totals = self._totals(('month', 'type', 'category'), year=year, month=month)
 
-        if month and not tx_in_month:
+        if month and not totals:
             print(f'No transaction found for {month}/{year}.')
             return False
 
-        if not month and not tx_in_year:
+        if not month and not totals:
             print(f'No transaction found for {year}.')
             return False
 
-        filtered_list = tx_in_month if month else tx_in_year
         report = 'Monthly Report' if month else 'Yearly Report'
-        final_report = self._report(filtered_list)
+        final_report = self._report(totals)
 
         if not month:
-            monthly_breakdown = self._monthly_breakdown(tx_in_year)
+            monthly_breakdown = self._monthly_breakdown(totals)
 
             print(f'{report}')
             for k, v in final_report.items():
@@ -165,29 +2280,62 @@ class FinanceTracker:
             for k, v in final_report.items():
                 print(f'{k:<20}: {v}')
 
-    def category_report(self, args):
-        expense_list = [tx for tx in self.transactions['transactions'] if tx.get('type') == 'expense']
-        year = args.year
-        month = getattr(args, 'month', None)
+    def range_report(self, args):
+        query = {'report': 'range', 'from': args.from_year, 'to': args.to_year, 'monthly': args.monthly}
+        self._cached(query, (f'{args.from_year:04d}-01', f'{args.to_year:04d}-12'), self._range_report, args)
 
-        logging.debug(f"Category report requested for year={year} month={month} - expense count={len(expense_list)}")
+    def _range_report(self, args):
+        if args.from_year > args.to_year:
+            print('--from-year must not be after --to-year')
+            return False
 
-        categories = defaultdict(list)
+        # whole years always come out of the monthly aggregates; --workers only matters when they have to be rebuilt
+        totals = self._totals(('year', 'month', 'type', 'category'), workers=args.workers,
+                              start=date(args.from_year, 1, 1), end=date(args.to_year, 12, 31))
 
+        if not totals:
+            print(f'No transaction found for {args.from_year}-{args.to_year}.')
+            return False
+
+        # keyed by (month, type, category) per year, like the totals behind the yearly report
+        yearly = defaultdict(dict)
+        for (year, month, tx_type, category), v in totals.items():
+            yearly[year][(month, tx_type, category)] = v
+
+        print(f'Range Report {args.from_year}-{args.to_year}')
+        for k, v in self._report(totals).items():
+            print(f'{k:<20}: {v}')
+
+        for year, year_totals in sorted(yearly.items()):
+            print('=' * 30)
+            print(f'\n{year}')
+            for k, v in self._report(year_totals).items():
+                print(f'{k:<20}: {v}')
+
+            if args.monthly:
+                for month, month_breakdown in self._monthly_breakdown(year_totals).items():
+                    print(f'\n{month}')
+                    for k, v in month_breakdown.items():
+                        print(f'{k:<20}: {v}')
+                    print('-' * 30)
 
-        for tx in expense_list:
-            date = self._parse_date(tx.get('date'))
+    def category_report(self, args):
+        month = getattr(args, 'month', None)
+        query = {'report': 'category', 'year': args.year, 'month': month}
+        self._cached(query, period_bounds(year=args.year, month=month), self._category_report, args)
 
-            if month and date.month == month and date.year == year:
-                categories[tx['category']].append(tx)
+    def _category_report(self, args):
+        year = args.year
+        month = getattr(args, 'month', None)
 
-            elif date.year == year:
-                categories[tx['category']].append(tx)
+        totals = self._totals(('category',), type='expense', year=year, month=month)
+
+        logging.debug("Category report requested for year=%s month=%s - categories=%s", year, month, len(totals))
 
         total_by_cat = {}
 
-        for category, expenses in categories.items():
-            total_by_cat[category] = round(sum(tx['amount'] for tx in expenses), 2)
+        for (category,), (cents, _) in totals.items():
+            total_by_cat[category] = cents
 
         sorted_total = dict(sorted(total_by_cat.items(), key=lambda x: x[1]))
         total_expenses = sum(sorted_total.values())
@@ -195,15 +2343,25 @@ class FinanceTracker:
         print('Report by Category')
 
         for k, v in sorted_total.items():
-            print(f'{k} : ${v} ({v/total_expenses * 100}%)')
+            print(f'{k} : ${v / 100} ({v/total_expenses * 100}%)')
 
     def set_budget(self, args):
+        with self.storage.lock.hold():
+            # re-read under the lock so a budget set by another process at the same time is kept
+            self._budgets = None
+            self._budget_index = None
+            self._set_budget(args)
+
+    def _set_budget(self, args):
         budgets = self.budgets['budgets']
         id = len(budgets) + 1
 
         limit = args.limit
         budget_month = args.month
         category = getattr(args, 'category', None)
+        if category:
+            # registered like a transaction's category, so a later add spelled differently lands in this budget
+            category = self._current_categories().add(category)
 
         month = date.today().month
 
@@ -213,22 +2371,25 @@ class FinanceTracker:
         else:
             year = date.today().year
 
-        logging.debug(f"Setting budget for month={budget_month}({date(year, budget_month, 1).strftime('%Y-%m-%d')}) limit={limit} category={category}")
+        logging.debug("Setting budget for month=%s(%s) limit=%s category=%s", budget_month, date(year, budget_month, 1), limit, category)
 
-        budget_exists = False
+        b = self.budget_index.by_month.get((year, budget_month))
+        # the index is rebuilt from the changed list next time
+        self._budget_index = None
 
-        for b in budgets:
-            if b['start_date'] == date(year, budget_month, 1).strftime("%Y-%m-%d"):
-                b[category] = limit
-                b.pop('total', None)
-                b['total'] = sum(
-                    v for k, v in b.items()
-                    if k not in ('start_date', 'end_date', 'total')
-                )
-                budget_exists = True
-                break
+        if b:
+            # the limit replaces one set before under another spelling
+            for k in [k for k in b if k not in BUDGET_FIELDS and k != category and self._category(k) == category]:
+                del b[k]
+            b[category] = limit
+            b.pop('total', None)
+            # summed in cents so the total is exact; budgets.json keeps the limits as they were entered
+            b['total'] = sum(
+                to_cents(v) for k, v in b.items()
+                if k not in BUDGET_FIELDS
+            ) / 100
 
-        if not budget_exists:
+        else:
             new_budget = {
                 'id': id,
                 'start_date': date(year, budget_month, 1).strftime('%Y-%m-%d'),
@@ -237,75 +2398,62 @@ class FinanceTracker:
                 'total': limit
             }
             budgets.insert(0, new_budget)
-            logging.debug(f"New budget added: {new_budget}")
+            logging.debug("New budget added: %s", new_budget)
 
-        self._save('budget', self.budgets)
+        self.storage.save_budgets(self.budgets)
+        # this process's own change, already in memory
+        self._budgets_stamp = self.storage.budget_stamp()
 
     def track_budget(self, args):
-        expense_list = [tx for tx in self.transactions['transactions'] if tx.get('type') == 'expense']
         latest_budgets = self._select_budget(args)
+        # spending comes from the monthly aggregates, so a status check never reads the ledger itself
+        has_expenses = self._current_rollup().has('expense')
 
-        logging.debug(f"Tracking budget - found {len(latest_budgets) if latest_budgets else 0} matching budgets and {len(expense_list)} expenses")
+        logging.debug("Tracking budget - found %s matching budgets, expenses: %s", len(latest_budgets), has_expenses)
 
         if not latest_budgets:
            print('There are no budgets matching these dates')
            return
 
-        elif not expense_list:
+        elif not has_expenses:
             print('You have no expenses')
             return
 
         budget_start = min(self._parse_date(b['start_date']) for b in latest_budgets)
         budget_end = max(self._parse_date(b['end_date']) for b in latest_budgets)
 
-        category = getattr(args, 'category', None)
+        category = self._category(getattr(args, 'category', None))
 
         if category:
-            if not any(category in b for b in latest_budgets):
+            if not any(category in self._budget_limits(b) for b in latest_budgets):
                 print(f'{category} was not part of your latest budget.')
                 return
 
-        expense_so_far = []
-
-        for tx in expense_list:
-            tx_date = self._parse_date(tx.get('date'))
-
-            if category:
-                if budget_start <= tx_date <= budget_end and category == tx['category']:
-                    expense_so_far.append(tx)
-            else:
-                if budget_start <= tx_date <= budget_end:
-                    expense_so_far.append(tx)
+        spent = self._totals((), type='expense', category=category, start=budget_start, end=budget_end)
+        total_expense = spent[()][0] if spent else 0
 
         budget_status = {}
         alert = None
 
+        # spending and limits are compared in cents
         if category:
-            budget_total = sum(b.get(category, 0) for b in latest_budgets)
-            total_expense = sum(tx['amount'] for tx in expense_so_far)
+            budget_total = sum(self._budget_limits(b).get(category, 0) for b in latest_budgets)
             budget_progress = total_expense / budget_total * 100
 
             budget_status['category'] = category
 
         else:
-            expense_report = self._report(expense_so_far)
-            budget_total = sum(b['total'] for b in latest_budgets)
-            total_expense = float(expense_report['expenses'])
+            budget_total = sum(to_cents(b['total']) for b in latest_budgets)
             if budget_total == 0:
                 print('Your budget is 0. Cannot calculate progress')
                 return
             else:
                 budget_progress = total_expense / budget_total * 100
 
-        if budget_progress > 100:
-            alert = f'You have exceeded your budget by ${total_expense - budget_total:.2f}!'
-        elif budget_progress == 100:
-            alert = 'You have reached your budget!'
-        elif 70 < budget_progress < 100:
-            alert = "You have almost reached your budget!"
+        alert = self._budget_alert(total_expense, budget_total)
 
-        budget_status['Budget total'] = f'${budget_total:.2f}'
-        budget_status['Total expenses'] = f'${total_expense:.2f}'
+        budget_status['Budget total'] = f'${format_cents(budget_total)}'
+        budget_status['Total expenses'] = f'${format_cents(total_expense)}'
         budget_status['Progress'] = f'{round(budget_progress)}%'
         if alert: budget_status['Alert'] = alert
 
@@ -314,12 +2462,97 @@ class FinanceTracker:
         for k, v in budget_status.items():
             print(f'{k}: {v}')
 
-        logging.debug(f"Budget status: {budget_status}")
+        logging.debug("Budget status: %s", budget_status)
+
+    def budget_dashboard(self, args):
+        start = self._parse_date(args.start_date)
+        end = self._parse_date(args.end_date)
+        if args.year:
+            start = max(start, date(args.year, 1, 1)) if start else date(args.year, 1, 1)
+            end = min(end, date(args.year, 12, 31)) if end else date(args.year, 12, 31)
+
+        category = self._category(args.category)
+        budgets = [b for b in self.budget_index.overlapping(start, end) if not category or category in self._budget_limits(b)]
+
+        if not budgets:
+            print('There are no budgets matching these dates')
+            return
+
+        # oldest first, each with its own dates
+        budgets = sorted(((b, self._parse_date(b['start_date']), self._parse_date(b['end_date'])) for b in budgets), key=lambda x: x[1])
+
+        # every budget made of whole months is answered from one grouped pass: spending per (month, category)
+        whole_months = [(b_start, b_end) for _, b_start, b_end in budgets if self.rollup.covers(b_start, b_end)]
+        monthly = defaultdict(dict)
+        if whole_months:
+            totals = self._totals(('year', 'month', 'category'), type='expense', category=category,
+                                  start=min(b_start for b_start, _ in whole_months), end=max(b_end for _, b_end in whole_months))
+            for (year, month, tx_category), (cents, _) in totals.items():
+                monthly[year * 12 + month - 1][tx_category] = cents
+
+        print('Budget Dashboard')
+        overall = defaultdict(lambda: [0, 0])
+
+        for b, b_start, b_end in budgets:
+            if self.rollup.covers(b_start, b_end):
+                spent = Counter()
+                for period in range(b_start.year * 12 + b_start.month - 1, b_end.year * 12 + b_end.month):
+                    spent.update(monthly.get(period, {}))
+            else:
+                # a hand-edited budget that doesn't cover whole months needs a query of its own
+                spent = {c: cents for (c,), (cents, _) in self._totals(('category',), type='expense', category=category, start=b_start, end=b_end).items()}
+
+            if b_start.day == 1 and b_end == date(b_start.year, b_start.month, calendar.monthrange(b_start.year, b_start.month)[1]):
+                title = f'{calendar.month_name[b_start.month]} {b_start.year}'
+            else:
+                title = f'{b_start} - {b_end}'
+
+            rows = []
+            for k, limit in self._budget_limits(b).items():
+                if category and k != category:
+                    continue
+                rows.append((k, spent.get(k, 0), limit))
+                overall[k][0] += spent.get(k, 0)
+                overall[k][1] += limit
+            if not category:
+                # like budget status: every expense in the period counts against the total
+                rows.append(('Total', sum(spent.values()), to_cents(b.get('total', 0))))
+
+            print(f'\n{title}')
+            self._print_budget_rows(rows)
+            print('-' * 30)
+
+        if len(budgets) > 1:
+            print('\nAll budgets')
+            self._print_budget_rows([(k, spent, limit) for k, (spent, limit) in overall.items()])
+
+    def _print_budget_rows(self, rows:list):
+        print(f"{'category':<20}{'spent':>12}{'limit':>12}{'progress':>10}")
+        for name, spent, limit in rows:
+            progress = f'{round(spent / limit * 100)}%' if limit else 'n/a'
+            alert = self._budget_alert(spent, limit) if limit else None
+            line = f'{name:<20}{format_cents(spent):>12}{format_cents(limit):>12}{progress:>10}'
+            print(f'{line}  {alert}' if alert else line)
+
+    def _budget_limits(self, b:dict) -> dict:
+        # a budget's limits in cents by registered category name; budgets set before the registry may use other spellings
+        limits = defaultdict(int)
+        for k, limit in b.items():
+            if k not in BUDGET_FIELDS:
+                limits[self._category(k)] += to_cents(limit)
+        return limits
+
+    def _budget_alert(self, spent:int, limit:int):
+        progress = spent / limit * 100
+        if progress > 100:
+            return f'You have exceeded your budget by ${format_cents(spent - limit)}!'
+        elif progress == 100:
+            return 'You have reached your budget!'
+        elif 70 < progress < 100:
+            return "You have almost reached your budget!"
+        return None
 
     def export_report(self, args):
-        expenses = [tx for tx in self.transactions['transactions'] if tx.get('type') == 'expense']
-        incomes = [tx for tx in self.transactions['transactions'] if tx.get('type') == 'income']
-        category = getattr(args, 'category', None)
         file_name = args.file_name
 
         if args.month and not args.year:
@@ -328,64 +2561,450 @@ class FinanceTracker:
 
         base_dir = Path(args.file_path).expanduser() if args.file_path else Path.home()/'Documents'
 
-        logging.debug(f"Exporting report to {base_dir} filename={file_name} format={args.format}")
+        logging.debug("Exporting report to %s filename=%s format=%s", base_dir, file_name, args.format)
 
         if not base_dir.exists():
             print('The path you provided does not exist')
             return
 
         output_path = base_dir/file_name
-
-        if args.format == 'csv' and output_path.suffix != '.csv':
-            logging.warning('Filename did not end with .csv, fixing automatically')
-            output_path = output_path.with_suffix('.csv')
-
-        elif args.format == 'json' and output_path.suffix != '.json':
-            logging.warning('Filename did not end with .json, fixing automatically')
-            output_path = output_path.with_suffix('.json')
-
-        if output_path.exists():
+        suffix = f'.{args.format}.gz' if args.gzip else f'.{args.format}'
+
+        if not output_path.name.endswith(suffix):
+            logging.warning('Filename did not end with %s, fixing automatically', suffix)
+            if output_path.suffix == '.gz':
+                output_path = output_path.with_suffix('')
+            output_path = output_path.with_suffix(f'.{args.format}')
+            if args.gzip:
+                output_path = output_path.with_name(output_path.name + '.gz')
+
+        if output_path.exists() and not args.force:
+            if not self.interactive:
+                print(f'{output_path} exists. Pass --force to overwrite it.')
+                return
             response = input(f"{output_path} exists. Overwrite? [y/N]: ").lower()
             if response != 'y':
                 print("Aborted by user.")
                 return
 
-        transaction_list = []
-        transactions_to_filter = expenses if args.type == 'expense' else incomes
+        filters = self._filters(args)
+        if args.type == 'all':
+            filters['type'] = None
+
+        # the same export of months nobody wrote to since is copied from the result cache
+        key = self._cache_key({'export': args.format, 'gzip': args.gzip, **filters}, *period_bounds(filters['start'], filters['end'], filters['month'], filters['year']))
+        cached = self.cache.get(key)
 
-        for tx in transactions_to_filter:
-            tx_date = self._parse_date(tx.get('date'))
-            if self._date_filter(args, tx_date) and (category is None or tx['category'] == category):
-                transaction_list.append(tx)
+        if cached is not None:
+            with open(output_path, 'wb') as f:
+                f.write(cached)
+            exported = 'cached'
+        else:
+            # rows are pulled from the backend one at a time and written as they arrive
+            transactions = map(self._present, self.storage.select(**filters))
+            writers = {'csv': self._create_csv, 'json': self._create_json, 'jsonl': self._create_jsonl}
+
+            with self._open_output(output_path, args.gzip) as f, STATS.phase('serialize'):
+                exported = writers[args.format](f, transactions)
 
-        if args.format == 'csv':
-            self._create_csv(output_path, transaction_list)
-            print(f'{file_name} has been created as {output_path}.')
+            if key and output_path.stat().st_size <= self.cache.max_bytes // 4:
+                self.cache.put(key, output_path.read_bytes())
 
-            logging.debug(f"Exported {len(transaction_list)} transactions to CSV: {output_path}")
+        print(f'{file_name} has been created as {output_path}.')
 
-        elif args.format == 'json':
-            self._create_json(output_path, transaction_list)
-            print(f'{file_name} has been created as {output_path}.')
+        logging.debug("Exported %s transactions to %s: %s", exported, args.format.upper(), output_path)
 
-            logging.debug(f"Exported {len(transaction_list)} transactions to JSON: {output_path}")
+    def import_transactions(self, args):
+        path = Path(args.file).expanduser()
 
-    def _save(self, data_type, data:dict ):
-        if data_type == 'transaction':
-            file = self.TRANSACTION_FILE
-        elif data_type == 'budget':
-            file = self.BUDGET_FILE
+        if not path.exists():
+            print('The file you provided does not exist')
+            return False
 
-        logging.debug(f"Saving {data_type} data to {file}")
+        file_format = args.format or path.suffix.lstrip('.').lower()
+        readers = {'csv': self._read_csv, 'json': self._read_json, 'jsonl': self._read_jsonl}
 
-        with tempfile.NamedTemporaryFile('w', dir=file.parent, delete=False) as tmp:
-            json.dump(data, tmp, indent=2)
-            temp_name = tmp.name
+        if file_format not in readers:
+            print('Cannot tell the file format from its name, please pass --format')
+            return False
+
+        logging.debug("Importing %s transactions from %s", file_format, path)
+        started = time.perf_counter()
+
+        # ids in the file are ignored so they cannot collide with the ledger; the storage hands out new ones
+        tx_list = []
+        skipped = 0
+
+        with STATS.phase('parse'):
+            # a row the reader could not parse comes as the error, and is skipped like any other invalid row
+            for line, row in readers[file_format](path):
+                try:
+                    if isinstance(row, Exception):
+                        raise row
+                    tx = self._validate_row(row, args.type)
+                except (ValueError, TypeError, KeyError) as e:
+                    skipped += 1
+                    if skipped <= IMPORT_ERRORS_SHOWN:
+                        logging.warning('%s:%s: skipped (%s)', path.name, line, e)
+                    continue
+
+                tx_list.append(tx)
+
+        if skipped > IMPORT_ERRORS_SHOWN:
+            logging.warning('%s more invalid rows were skipped', skipped - IMPORT_ERRORS_SHOWN)
+
+        # one save for the whole file
+        if tx_list:
+            self._record(tx_list)
+
+        elapsed = time.perf_counter() - started
+        rate = (len(tx_list) + skipped) / elapsed if elapsed else 0
+
+        print(f'Imported {len(tx_list)} transactions ({skipped} skipped) in {elapsed:.2f}s ({rate:,.0f} rows/s)')
+
+    def list_categories(self, args):
+        registry = self._current_categories()
+        if not registry.names:
+            print('You have no categories')
+            return False
+
+        # usage comes from the monthly aggregates, so listing categories never reads the ledger
+        totals = self._current_rollup().totals(('category', 'type'))
+
+        print(f"{'id':>4}  {'category':<20}{'expenses':>10}{'spent':>12}{'income':>10}{'earned':>12}")
+        for name in registry.names:
+            spent, expenses = totals.get((name, 'expense'), (0, 0))
+            earned, incomes = totals.get((name, 'income'), (0, 0))
+            print(f'{registry.id(name):>4}  {name:<20}{expenses:>10}{format_cents(spent):>12}{incomes:>10}{format_cents(earned):>12}')
+
+    def compact(self, args=None):
+        self.storage.compact()
+
+        if args is not None:
+            print(f'Compacted ledger: {self.storage.count()} transactions')
+
+    def migrate(self, args):
+        target = STORAGE_BACKENDS[args.to](self.BASE_DIR)
+
+        if target.count():
+            print(f'The {args.to} ledger already has transactions. Aborting migration.')
+            return False
+
+        transaction_list = list(self.storage.select())
+        logging.debug("Migrating %s transactions and %s budgets to %s", len(transaction_list), len(self.budgets['budgets']), args.to)
+
+        # the categories keep their ids; first, as the target's snapshot numbers them the same way
+        CategoryRegistry(target.CATEGORY_FILE).rebuild(self._current_categories().names)
+        target.add_transactions(transaction_list)
+        target.save_budgets(self.budgets)
+        target.compact()
+        # results cached for the target before it had these transactions
+        ResultCache(target.CACHE_DIR, target.lock, 1).clear()
+
+        print(f"Migrated {len(transaction_list)} transactions and {len(self.budgets['budgets'])} budgets to the {args.to} backend")
+
+    def rebuild_aggregates(self, args):
+        if args.check:
+            expected = self.storage.totals(Rollup.FIELDS)
+            actual = self.rollup.totals(Rollup.FIELDS)
+
+            mismatches = []
+            for key in sorted(set(expected) | set(actual), key=str):
+                scanned = expected.get(key, (0, 0))
+                rolled = actual.get(key, (0, 0))
+                if scanned != rolled:
+                    mismatches.append((key, scanned, rolled))
+
+            if not mismatches:
+                print(f'Aggregates match a full scan ({len(expected)} groups, {self.storage.count()} transactions)')
+                return True
+
+            print(f'{len(mismatches)} aggregate groups differ from a full scan:')
+            for (year, month, tx_type, category), scanned, rolled in mismatches:
+                print(f'{year}-{month:02d} {tx_type} {category}: scan ${format_cents(scanned[0])} ({scanned[1]}) vs aggregates ${format_cents(rolled[0])} ({rolled[1]})')
+            print('Run rebuild-aggregates to fix them')
+            return False
+
+        self.rollup.rebuild(self.storage, args.workers)
+        # whatever made the aggregates wrong may have made cached results wrong too
+        self.cache.clear()
+        print(f'Rebuilt aggregates: {len(self.rollup.rows)} groups from {self.rollup.count} transactions')
+
+    def flush(self):
+        with self.storage.lock.hold():
+            self.storage.flush()
+            if self.rollup.dirty:
+                self.rollup.save()
+            # only now that the rows are on disk do cached results covering their months go out of date
+            if self._unflushed:
+                self.cache.touch(self._unflushed)
+                self._unflushed = []
+
+    def refresh(self):
+        # see what other processes wrote since the ledger was read; a rollup with unsaved rows is this process's own
+        self.cache.pin()
+        self.storage.refresh()
+        if not self.rollup.dirty:
+            self.rollup.reload()
+        self.categories.reload()
+        self.search_index.reload()
+        self._refresh_budgets()
+
+    def follow(self):
+        # watch mode: catch up with other processes. New transactions are added to the aggregates held in memory, so the
+        # cost is the size of the change; anything else (a compaction, or a rollup that was behind) re-reads the file
+        with self.storage.lock.hold(shared=True):
+            self.cache.pin()
+            tx_list = self.storage.changes()
+            self.storage.refresh()
+            ledger_count = self.storage.count()
+
+            if tx_list is not None and self.rollup.is_current(ledger_count - len(tx_list)):
+                self.rollup.follow(tx_list)
+            else:
+                self.rollup.reload()
+
+        logging.debug("Followed %s new transactions", 'unknown' if tx_list is None else len(tx_list))
+        self.categories.reload()
+        self._refresh_budgets()
+
+    def _refresh_budgets(self):
+        # a daemon request or a watch redraw reuses the budgets and their index unless they changed on disk
+        if self._budgets is not None and self.storage.budget_stamp() != self._budgets_stamp:
+            self._budgets = None
+            self._budget_index = None
+
+    def _record(self, tx_list:list):
+        batch = None
+        if self.spool and not self.defer_writes:
+            # parked before waiting for the lock, so it can ride along with whoever holds it now
+            batch = self.spool.park(tx_list)
+
+        # the ledger and the rollup are updated under one lock, so concurrent writers take turns
+        with self.storage.lock.hold():
+            self.refresh()
+            ledger_count = self.storage.count()
+
+            batches = []
+            if batch:
+                if not batch.exists():
+                    logging.debug("%s was already committed by another writer", batch.name)
+                    return
+                batches, tx_list = self.spool.take()
+                logging.debug("Group commit: %s transactions from %s writers", len(tx_list), len(batches))
+
+            # under the lock, so two writers can't register the same new category in two spellings
+            self._current_categories().register(tx_list)
+            self.storage.add_transactions(tx_list, defer=self.defer_writes)
+            # cached results covering these months are out of date now; deferred rows once they are flushed
+            if self.defer_writes:
+                self._unflushed += tx_list
+            else:
+                self.cache.touch(tx_list)
+            # now that the rows have their ids
+            self.search_index.add(tx_list)
+            # removed only once the rows are stored: a crash in between stores a batch twice rather than losing it
+            for b in batches:
+                b.unlink()
+
+            # a stale rollup is left alone; it gets rebuilt the next time a report needs it
+            if self.rollup.is_current(ledger_count):
+                self.rollup.add(tx_list, save=not self.defer_writes)
+
+    def _totals(self, group_by:tuple, workers:int = 1, **filters) -> dict:
+        if not self.rollup.covers(filters.get('start'), filters.get('end')):
+            return self.storage.totals(group_by, **filters)
+
+        return self._current_rollup(workers).totals(group_by, **filters)
+
+    def _current_rollup(self, workers:int = 1) -> Rollup:
+        if not self.rollup.is_current(self.storage.count()):
+            logging.info('Aggregates in %s are out of date, rebuilding', self.rollup.FILE.name)
+            self.rollup.rebuild(self.storage, workers)
+        return self.rollup
+
+    def _cached(self, query:dict, bounds:tuple, render, args):
+        # prints what render(args) printed for the same query, as long as no transaction in the months of bounds changed since
+        key = self._cache_key(query, *bounds)
+        output = self.cache.get(key)
+
+        if output is None:
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                render(args)
+            output = out.getvalue().encode()
+            self.cache.put(key, output)
+
+        sys.stdout.write(output.decode())
+
+    def _cache_key(self, query:dict, lo=None, hi=None):
+        # rows the daemon hasn't flushed are in no version yet, so results covering their months aren't cached
+        for tx in self._unflushed:
+            period = month_period(tx['date'])
+            if (lo is None or period >= lo) and (hi is None or period <= hi):
+                return None
+        return self.cache.key(query, lo, hi)
+
+    def _current_categories(self) -> CategoryRegistry:
+        registry = self.categories
+        registry.names
+        if not registry.exists:
+            with self.storage.lock.hold():
+                registry.reload()
+                registry.names
+                if not registry.exists:
+                    # a ledger from before the registry: its categories in order of first use
+                    logging.info('%s is missing, registering the categories in the ledger', registry.FILE.name)
+                    registry.rebuild(category for (category,) in self._current_rollup().totals(('category',)))
+        return registry
+
+    def _current_index(self) -> SearchIndex:
+        index = self.search_index
+        with self.storage.lock.hold(shared=True):
+            stale = index.count() != self.storage.count()
+            full = not stale and index.tail_size() >= SEARCH_TAIL_THRESHOLD
+
+        if stale or full:
+            # exclusive, so no writer appends to the tail while it is being replaced
+            with self.storage.lock.hold():
+                self.storage.refresh()
+                index.reload()
+                if index.count() != self.storage.count():
+                    logging.info('Search index %s is out of date, rebuilding', index.FILE.name)
+                    index.build(self.storage.select())
+                elif index.tail_size() >= SEARCH_TAIL_THRESHOLD:
+                    index.fold()
+        return index
+
+    def _category(self, name):
+        return self._current_categories().resolve(name) if name else name
+
+    def _validate_row(self, row:dict, default_type=None) -> dict:
+        if not isinstance(row, dict):
+            raise ValueError(f'expected an object, got {row!r}')
+
+        tx_type = row.get('type') or default_type
+        if tx_type not in ('expense', 'income'):
+            raise ValueError(f'type must be expense or income, got {tx_type!r}')
+
+        tx_date = self._parse_date(row.get('date'))
+        if tx_date is None:
+            raise ValueError('missing date')
+
+        # exports carry amounts, transactions.json snapshots carry cents
+        cents = int(row['cents']) if row.get('cents') is not None else to_cents(row['amount'])
+
+        category = row.get('category')
+        if not category:
+            raise ValueError('missing category')
+        if not isinstance(category, str):
+            raise ValueError(f'category must be text, got {category!r}')
+
+        description = row.get('description')
+        if description is not None and not isinstance(description, str):
+            raise ValueError(f'description must be text, got {description!r}')
+
+        return {
+            'id': None,
+            'type': tx_type,
+            'date': tx_date.isoformat(),
+            'cents': cents,
+            'category': category,
+            # the CSV export writes None as an empty cell
+            'description': description or None,
+        }
+
+    def _read_csv(self, path:Path):
+        # every reader yields (line, row), or (line, error) for a row that can't be parsed
+        with open(path, 'r', newline='') as f:
+            reader = csv.DictReader(f)
+            while True:
+                try:
+                    row = next(reader)
+                except StopIteration:
+                    return
+                except csv.Error as e:
+                    row = ValueError(str(e))
+                yield reader.line_num, row
+
+    def _read_json(self, path:Path):
+        with open(path, 'r') as f:
+            try:
+                data = json.load(f)
+            except ValueError as e:
+                # one document: nothing in it can be read
+                yield getattr(e, 'lineno', 1), ValueError(f'not valid JSON: {e}')
+                return
+
+        # either an export (a list) or a transactions.json snapshot, whose records point into its category table
+        rows = data.get('transactions', []) if isinstance(data, dict) else data
+        table = data.get('categories') if isinstance(data, dict) else None
+        if not isinstance(rows, list):
+            yield 1, ValueError('expected a list of transactions')
+            return
+
+        for i, row in enumerate(rows, start=1):
+            if table is not None and isinstance(row, dict):
+                try:
+                    row['category'] = table[row['category']]
+                except (KeyError, IndexError, TypeError):
+                    row = ValueError(f"category {row.get('category')!r} is not in the file's category table")
+            yield i, row
+
+    def _read_jsonl(self, path:Path):
+        with open(path, 'r') as f:
+            for i, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield i, json.loads(line)
+                    except ValueError as e:
+                        yield i, ValueError(f'not valid JSON: {e}')
+
+    def _write_transactions(self, transactions, table=False) -> int:
+        # LIST_BUFFER_ROWS transactions per write instead of a print() per line
+        out = sys.stdout
+        lines = []
+        shown = 0
+
+        for shown, tx in enumerate(transactions, start=1):
+            if table:
+                if shown == 1:
+                    lines.append(f"{'id':>8}  {'date':<10}  {'type':<7}  {'amount':>12}  {'category':<20}  description\n")
+                lines.append(f"{tx['id']:>8}  {tx['date']:<10}  {tx['type']:<7}  {format_cents(tx['cents']):>12}  "
+                             f"{tx['category'][:20]:<20}  {tx['description'] or ''}\n")
+            else:
+                lines.append(''.join(f'{k}: {v}\n' for k, v in self._present(tx).items()) + '-' * 30 + '\n')
+
+            if len(lines) >= LIST_BUFFER_ROWS:
+                out.write(''.join(lines))
+                lines = []
+
+        out.write(''.join(lines))
+        return shown
+
+    def _present(self, tx:dict) -> dict:
+        # what list and export show: the amount in currency units, in the export column order
+        return {
+            'id': tx['id'],
+            'type': tx['type'],
+            'date': tx['date'],
+            'amount': tx['cents'] / 100,
+            'category': tx['category'],
+            'description': tx['description'],
+        }
 
-        os.replace(temp_name, file)
+    def _filters(self, args) -> dict:
+        return {
+            'type': getattr(args, 'type', None),
+            'category': self._category(getattr(args, 'category', None)),
+            'start': self._parse_date(getattr(args, 'start_date', None)),
+            'end': self._parse_date(getattr(args, 'end_date', None)),
+            'month': getattr(args, 'month', None),
+            'year': getattr(args, 'year', None),
+        }
 
     def _parse_date(self, s):
-        return datetime.strptime(s, '%Y-%m-%d').date() if s else None
+        return parse_date(s)
 
     def _date_filter(self, args, date) -> bool:
 
@@ -408,86 +3027,371 @@ class FinanceTracker:
 
         return True
 
-    def _monthly_breakdown(self, transactions:list) -> dict:
-        monthly = defaultdict(list)
+    def _monthly_breakdown(self, totals:dict) -> dict:
+        monthly = defaultdict(dict)
         monthly_report = {}
 
-        for tx in transactions:
-            date = self._parse_date(tx.get('date'))
-            monthly[date.month].append(tx)
-
-        sorted_monthly = dict(sorted(monthly))
+        # totals are keyed by (month, type, category)
+        for (month, tx_type, category), v in totals.items():
+            monthly[month][(tx_type, category)] = v
 
-        for month, tx in sorted_monthly.items():
-            monthly_report[calendar.month_name[month]] = self._report(tx)
+        for month, month_totals in sorted(monthly.items()):
+            monthly_report[calendar.month_name[month]] = self._report(month_totals)
 
         return monthly_report
 
-    def _report(self, tx_lst:list) -> dict:
+    def _report(self, totals:dict) -> dict:
+
+        # totals are keyed by tuples ending in (type, category), with (cents, count) values
+        total_expenses = 0
+        total_income = 0
+        categories = Counter()
+        categories_amount = defaultdict(int)
+
+        for key, (cents, count) in totals.items():
+            tx_type, category = key[-2:]
+            if tx_type == 'expense':
+                total_expenses += cents
+            elif tx_type == 'income':
+                total_income += cents
+            if category:
+                categories[category] += count
+                categories_amount[category] += cents
 
-        total_expenses = round(sum(tx['amount'] for tx in tx_lst if tx.get('type') == 'expense'), 2)
-        total_income = round(sum(tx['amount'] for tx in tx_lst if tx.get('type') == 'income'), 2)
         net_savings = total_income - total_expenses
 
         final_report = {
-            'expenses': f'{total_expenses:.2f}',
-            'income': f'{total_income:.2f}',
-            'savings': f'{net_savings:.2f}',
+            'expenses': format_cents(total_expenses),
+            'income': format_cents(total_income),
+            'savings': format_cents(net_savings),
         }
 
-        categories = [tx['category'] for tx in tx_lst if 'category' in tx]
-
         if categories:
-            most_common_category = Counter(categories).most_common(1)[0][0]
-            categories_expense = round(sum(tx['amount'] for tx in tx_lst if tx['category'] == most_common_category), 2)
+            most_common_category = categories.most_common(1)[0][0]
+            categories_expense = categories_amount[most_common_category] / 100
             final_report['most common expense'] = f'{most_common_category} ({categories_expense})'
 
         return final_report
 
     def _select_budget(self, args) -> list:
 
-        budgets = self.budgets['budgets']
+        index = self.budget_index
 
         if not any([args.month, args.year, args.start_date, args.end_date]):
-            return [budgets[0]]
+            return index.budgets[:1]
 
         else:
             start = self._parse_date(args.start_date)
             end = self._parse_date(args.end_date)
 
+            if args.start_date and args.end_date:
+                return index.overlapping(start, end)
+
+            # a budget matches when its first or last day passes every filter, so it overlaps the dates and the year asked for
+            if args.year:
+                start = max(start, date(args.year, 1, 1)) if start else date(args.year, 1, 1)
+                end = min(end, date(args.year, 12, 31)) if end else date(args.year, 12, 31)
+
             b_list = []
-            for b in budgets:
-                b_start = self._parse_date(b['start_date'])
-                b_end = self._parse_date(b['end_date'])
+            for b in index.overlapping(start, end):
+                if self._date_filter(args, self._parse_date(b['start_date'])) or self._date_filter(args, self._parse_date(b['end_date'])):
+                    b_list.append(b)
+
+            return b_list
 
-                if args.start_date and args.end_date:
-                    if b_start <= end and b_end >= start:
-                        b_list.append(b)
+    def _open_output(self, output, compress=False):
+        if compress:
+            return gzip.open(output, 'wt', newline='')
+        return open(output, 'w', newline='')
+
+    def _create_csv(self, f, data) -> int:
+        fieldnames = ['id', 'type', 'date', 'amount', 'category', 'description']
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+
+        writer.writeheader()
+        count = 0
+        for count, tx in enumerate(data, start=1):
+            writer.writerow(tx)
+        return count
+
+    def _create_json(self, f, data) -> int:
+        # a JSON array written one record per line, so the whole export never has to be in memory
+        f.write('[')
+        count = 0
+        for count, tx in enumerate(data, start=1):
+            f.write(',\n  ' if count > 1 else '\n  ')
+            f.write(json.dumps(tx))
+        f.write('\n]\n' if count else ']\n')
+        return count
+
+    def _create_jsonl(self, f, data) -> int:
+        count = 0
+        for count, tx in enumerate(data, start=1):
+            f.write(json.dumps(tx))
+            f.write('\n')
+        return count
+
+# ================ DAEMON ================
+# 'serve' keeps one FinanceTracker resident and answers CLI invocations over a Unix socket in the data directory.
+# A request is one JSON line {"argv": [...], "cwd": ...} and the reply one JSON line {"status": ..., "output": ...}.
+# Commands run one at a time on the event loop, so writes are serialized. Adds are buffered and flushed together
+# every DAEMON_FLUSH_INTERVAL seconds, and an add is only acknowledged once the flush holding it is on disk.
+# asyncio is only imported inside the daemon code, so ordinary invocations don't pay for it.
+
+DAEMON_SOCKET = 'tracker.sock'
+DAEMON_FLUSH_INTERVAL = 0.01
+# commands whose reply waits for the next flush
+WRITE_COMMANDS = ('add', 'import')
+
+
+class TrackerDaemon:
+
+    def __init__(self, tracker:FinanceTracker, parser:argparse.ArgumentParser, flush_interval:float = DAEMON_FLUSH_INTERVAL):
+        self.tracker = tracker
+        self.parser = parser
+        self.flush_interval = flush_interval
+        self._waiting = []
+
+    def run_command(self, argv:list, cwd:str) -> tuple:
+        out = io.StringIO()
+        status = 0
+        command = None
+        failure = None
+
+        # warnings (skipped import rows, renamed export files) belong to the caller, not the daemon's log
+        handler = logging.StreamHandler(out)
+        handler.setLevel(logging.WARNING)
+        handler.setFormatter(logging.Formatter('[%(levelname)s] %(message)s'))
+        logging.getLogger().addHandler(handler)
+        previous_cwd = os.getcwd()
+
+        try:
+            # relative paths in export/import are relative to the caller
+            os.chdir(cwd)
+            with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+                args = self.parser.parse_args(argv)
+                command = args.commands
+
+                if args.backend != self.tracker.backend:
+                    print(f'The daemon serves the {self.tracker.backend} backend, not {args.backend}')
+                    status = 1
+                elif command == 'serve':
+                    print('A daemon is already running for this ledger')
+                    status = 1
+                elif getattr(args, 'watch', None):
+                    print('--watch runs in its own process, pass --no-daemon')
+                    status = 1
+                elif hasattr(args, 'func'):
+                    # --no-daemon processes may have written to the ledger since the last request
+                    self.tracker.refresh()
+                    TransactionColumns.engine = args.engine
+                    run_instrumented(self.tracker, args, argv)
                 else:
-                    if self._date_filter(args, b_start) or self._date_filter(args, b_end):
-                        b_list.append(b)
+                    self.parser.print_help()
+        except SystemExit as e:
+            status = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            failure = e
+            out.write(f'Error: {e}\n')
+            status = 1
+        finally:
+            os.chdir(previous_cwd)
+            logging.getLogger().removeHandler(handler)
+
+        if failure is not None:
+            # only once the caller's handler is gone: the traceback is for the daemon's log, the caller gets the Error: line
+            logging.error('Request %s failed', argv, exc_info=failure)
+
+        return status, out.getvalue(), command
+
+    async def handle(self, reader, writer):
+        try:
+            request = json.loads(await reader.readline())
+            status, output, command = self.run_command(request['argv'], request.get('cwd', os.getcwd()))
+
+            if command in WRITE_COMMANDS:
+                await self._next_flush()
+
+            writer.write(json.dumps({'status': status, 'output': output}).encode() + b'\n')
+            await writer.drain()
+        except Exception:
+            logging.exception('Could not answer request')
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path:Path):
+        import asyncio
+
+        server = await asyncio.start_unix_server(self.handle, path=str(socket_path))
+        loop = asyncio.get_running_loop()
+        stop = loop.create_future()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, lambda: stop.done() or stop.set_result(None))
+
+        flusher = asyncio.create_task(self._flush_loop())
+        print(f'Serving {self.tracker.BASE_DIR} ({self.tracker.backend}) on {socket_path}', flush=True)
+
+        try:
+            await stop
+        finally:
+            server.close()
+            await server.wait_closed()
+            flusher.cancel()
+            self._flush()
+            socket_path.unlink(missing_ok=True)
+            print('Daemon stopped', flush=True)
+
+    async def _next_flush(self):
+        import asyncio
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.append(waiter)
+        await waiter
+
+    async def _flush_loop(self):
+        import asyncio
+
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if self._waiting:
+                self._flush()
+
+    def _flush(self):
+        waiting, self._waiting = self._waiting, []
+        try:
+            self.tracker.flush()
+        except Exception as e:
+            logging.exception('Flush failed')
+            for waiter in waiting:
+                waiter.set_exception(e)
+            return
 
-            return b_list
+        for waiter in waiting:
+            waiter.set_result(None)
 
-    def _create_csv(self, output, data:list):
 
-        with open(output, 'w', newline='') as f:
-            fieldnames = ['id', 'type', 'date', 'amount', 'category', 'description']
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
+def serve(args, parser:argparse.ArgumentParser):
+    tracker = FinanceTracker(base_dir=args.data_dir, backend=args.backend, cache_size=args.cache_size)
+    socket_path = tracker.BASE_DIR / DAEMON_SOCKET
 
-            writer.writeheader()
-            writer.writerows(data)
+    if forward(socket_path, []) is not None:
+        print(f'A daemon is already serving {tracker.BASE_DIR}')
+        return False
+    # left behind by a daemon that did not shut down cleanly
+    socket_path.unlink(missing_ok=True)
 
-    def _create_json(self, output, data:list):
+    tracker.defer_writes = True
+    tracker.interactive = False
+    tracker.storage.load()
 
-        with open(output, 'w') as f:
-            json.dump(data, f, indent=2)
+    import asyncio
+    asyncio.run(TrackerDaemon(tracker, parser, args.flush_interval).serve(socket_path))
 
-def main():
 
-    tracker = FinanceTracker()
+def forward(socket_path:Path, argv:list):
+    if not socket_path.exists():
+        return None
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except (ConnectionRefusedError, FileNotFoundError):
+            return None
+
+        # past this point the daemon has the request, and may have applied it, so it must not be run here again
+        try:
+            sock.sendall(json.dumps({'argv': argv, 'cwd': os.getcwd()}).encode() + b'\n')
+            reply = sock.makefile('rb').readline()
+        except OSError:
+            reply = b''
+
+    if not reply:
+        return {'status': 1, 'output': 'Error: the daemon closed the connection without replying, the command may or may not have run\n'}
+    return json.loads(reply)
+
+
+# ================ WATCH MODE ================
+# --watch keeps the tracker resident and redraws a report or budget command whenever the ledger or the budgets change
+# on disk. Checking is a few stat() calls (PRAGMA data_version on SQLite); a change is caught up with FinanceTracker.follow().
+
+WATCH_INTERVAL = 2.0
+
+
+def watch(tracker:FinanceTracker, args, argv:list):
+    # where following starts: anything written after this is a change, even during the first draw
+    tracker.storage.changes()
+    stamp = tracker.storage.stamp()
+
+    try:
+        while True:
+            if sys.stdout.isatty():
+                print('\033[H\033[J', end='')
+            print(f"Every {args.watch:g}s: {' '.join(argv)}    {datetime.now():%Y-%m-%d %H:%M:%S}\n")
+            run_instrumented(tracker, args, argv)
+            sys.stdout.flush()
+
+            while True:
+                time.sleep(args.watch)
+                current = tracker.storage.stamp()
+                if current != stamp:
+                    break
+            stamp = current
+            tracker.follow()
+    except KeyboardInterrupt:
+        print()
+
+
+# ================ PROFILING ================
+# --profile prints the phase table and a cProfile summary to stderr, --stats-json writes the phase timings and
+# counters as JSON ('-' for stdout). Without either flag the command runs exactly as before.
+
+PROFILE_ROWS = 25
+
+
+def run_instrumented(tracker:FinanceTracker, args, argv:list):
+    if not (args.profile or args.stats_json):
+        return args.func(tracker, args)
+
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+
+    STATS.enable()
+    try:
+        if profiler:
+            profiler.enable()
+        return args.func(tracker, args)
+    finally:
+        if profiler:
+            profiler.disable()
+        STATS.disable()
+
+        summary = {'command': argv, 'backend': tracker.backend, **STATS.summary()}
+        if args.stats_json == '-':
+            print(json.dumps(summary, indent=2))
+        elif args.stats_json:
+            save_json(Path(args.stats_json).expanduser(), summary)
+
+        if profiler:
+            import pstats
+            print(STATS.table(), file=sys.stderr)
+            pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(PROFILE_ROWS)
+
+
+def build_parser() -> argparse.ArgumentParser:
 
     parser = argparse.ArgumentParser(description='Financial Tracker')
+    parser.add_argument('--data-dir', type=str, default=os.environ.get('FINANCE_TRACKER_DIR'), help='Directory holding the ledger files (default: next to this script, or $FINANCE_TRACKER_DIR)')
+    parser.add_argument('--backend', choices=STORAGE_BACKENDS, default=os.environ.get('FINANCE_TRACKER_BACKEND', 'json'), help='Storage backend (default: json, or $FINANCE_TRACKER_BACKEND)')
+    parser.add_argument('--no-daemon', action='store_true', help='Run in this process even if a daemon is serving the ledger')
+    parser.add_argument('--group-commit', action='store_true', default=bool(os.environ.get('FINANCE_TRACKER_GROUP_COMMIT')), help='Merge adds from concurrent processes into one save (or set $FINANCE_TRACKER_GROUP_COMMIT)')
+    parser.add_argument('--engine', choices=ENGINES, default=os.environ.get('FINANCE_TRACKER_ENGINE', 'auto'), help=f'Filter and total the JSON ledger in pure Python or with NumPy (default: auto, NumPy from {NUMPY_MIN_ROWS:,} transactions if installed; or $FINANCE_TRACKER_ENGINE)')
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default=os.environ.get('FINANCE_TRACKER_LOG_LEVEL', 'warning'), help='Log messages from this level up to stderr (default: warning, or $FINANCE_TRACKER_LOG_LEVEL)')
+    parser.add_argument('--cache-size', type=float, default=float(os.environ.get('FINANCE_TRACKER_CACHE_SIZE', CACHE_SIZE_MB)), metavar='MIB', help=f'Size cap of the on-disk cache of report and export results, 0 to turn it off (default: {CACHE_SIZE_MB}, or $FINANCE_TRACKER_CACHE_SIZE)')
+    parser.add_argument('--profile', action='store_true', help='Print per-phase timings, row counters and a cProfile summary to stderr')
+    parser.add_argument('--stats-json', type=str, metavar='FILE', help="Write per-phase timings and row counters as JSON to FILE ('-' for stdout)")
     subparsers = parser.add_subparsers(dest='commands', help='Available commands')
 
 
@@ -497,29 +3401,66 @@ def main():
 
     # ========= TRANSACTION TYPES: EXPENSE =========
     expense_parser = add_command_subparser.add_parser('expense', help='Add an expense')
-    expense_parser.add_argument('--amount', type=float, help='Expense amount')
+    expense_parser.add_argument('--amount', dest='cents', type=cents_argument, required=True, help='Expense amount')
     expense_parser.add_argument('--category', type=str, required=True, help='Expense category')
     expense_parser.add_argument('--description', type=str, help='Expense description')
-    expense_parser.add_argument('--date', type=str, help='Expense description (YYYY-MM-DD)')
-    expense_parser.set_defaults(func=tracker.add_expense)
+    expense_parser.add_argument('--date', type=date_argument, help='Expense date (YYYY-MM-DD)')
+    expense_parser.set_defaults(func=FinanceTracker.add_expense)
 
     # ========= TRANSACTION TYPES: INCOME =========
     income_parser = add_command_subparser.add_parser('income', help="Add an income")
-    income_parser.add_argument('--amount', type=float, help='Income amount')
+    income_parser.add_argument('--amount', dest='cents', type=cents_argument, required=True, help='Income amount')
     income_parser.add_argument('--category', required=True,  type=str, help='Income category')
     income_parser.add_argument('--description', type=str, help='Income description')
-    income_parser.add_argument('--date', type=str, help='Income date (YYYY-MM-DD)')
-    income_parser.set_defaults(func=tracker.add_income)
+    income_parser.add_argument('--date', type=date_argument, help='Income date (YYYY-MM-DD)')
+    income_parser.set_defaults(func=FinanceTracker.add_income)
+
+    # ================ IMPORT COMMAND ================
+    import_parser = subparsers.add_parser('import', help='Import transactions from a CSV, JSON or JSON Lines file')
+    import_parser.add_argument('--file', type=str, required=True, help='File to import (columns: type, date, amount, category, description)')
+    import_parser.add_argument('--format', choices=['csv', 'json', 'jsonl'], help='File format (default: from the file extension)')
+    import_parser.add_argument('--type', choices=['expense', 'income'], help='Type for rows that do not have one')
+    import_parser.set_defaults(func=FinanceTracker.import_transactions)
+
+    # ================ CATEGORIES COMMAND ================
+    categories_parser = subparsers.add_parser('categories', help='List every category with its id and how often it is used')
+    categories_parser.set_defaults(func=FinanceTracker.list_categories)
+
+    # ================ COMPACT COMMAND ================
+    compact_parser = subparsers.add_parser('compact', help='Compact storage (fold the JSON journal into transactions.json, VACUUM the SQLite ledger)')
+    compact_parser.set_defaults(func=FinanceTracker.compact)
+
+    # ================ REBUILD-AGGREGATES COMMAND ================
+    aggregates_parser = subparsers.add_parser('rebuild-aggregates', help='Rebuild the monthly aggregates used by reports')
+    aggregates_parser.add_argument('--check', action='store_true', help='Only compare the aggregates with a full scan')
+    aggregates_parser.add_argument('--workers', type=int, default=1, help='Scan the ledger in contiguous row slices, one per process')
+    aggregates_parser.set_defaults(func=FinanceTracker.rebuild_aggregates)
+
+    # ================ MIGRATE COMMAND ================
+    migrate_parser = subparsers.add_parser('migrate', help='Copy transactions and budgets into another storage backend')
+    migrate_parser.add_argument('--to', choices=STORAGE_BACKENDS, required=True, help='Target backend')
+    migrate_parser.set_defaults(func=FinanceTracker.migrate)
 
     # ================ LIST COMMAND ================
-    list_parser = subparsers.add_parser('list', help='List transactions')
-    list_parser.add_argument('--category', type=str, help='Filter by category')
-    list_parser.add_argument('--type', choices=['expense', 'income'], help='Filter by type')
-    list_parser.add_argument('--start-date', type=str, help='Start date (YYYY-MM-DD)')
-    list_parser.add_argument('--end-date', type=str, help='End date (YYYY-MM-DD)')
-    list_parser.add_argument('--month', type=int, choices=range(1,12), help='Filter by month (1-12)')
-    list_parser.add_argument('--year', type=int, help='Filter by year')
-    list_parser.set_defaults(func=tracker.list_transactions)
+    # the filters, order and paging shared by list and search
+    listing_options = argparse.ArgumentParser(add_help=False)
+    listing_options.add_argument('--category', type=str, help='Filter by category')
+    listing_options.add_argument('--type', choices=['expense', 'income'], help='Filter by type')
+    listing_options.add_argument('--start-date', type=date_argument, help='Start date (YYYY-MM-DD)')
+    listing_options.add_argument('--end-date', type=date_argument, help='End date (YYYY-MM-DD)')
+    listing_options.add_argument('--month', type=int, choices=range(1, 13), help='Filter by month (1-12)')
+    listing_options.add_argument('--year', type=int, help='Filter by year')
+    listing_options.add_argument('--sort', choices=LIST_ORDERS, default='newest', help='Newest or oldest first, or largest or smallest amount first (default: newest)')
+    listing_options.add_argument('--limit', type=int, help='Show at most this many transactions')
+    listing_options.add_argument('--offset', type=int, default=0, help='Skip this many transactions first, for the next page')
+    listing_options.add_argument('--table', action='store_true', help='One line per transaction instead of one line per field')
+
+    list_parser = subparsers.add_parser('list', parents=[listing_options], help='List transactions')
+    list_parser.set_defaults(func=FinanceTracker.list_transactions)
+
+    search_parser = subparsers.add_parser('search', parents=[listing_options], help='Find transactions by the words in their description or category')
+    search_parser.add_argument('terms', nargs='+', help='Words that must all appear (case-insensitive); end one with * to match every word starting with it')
+    search_parser.set_defaults(func=FinanceTracker.search)
 
     # ================ REPORT COMMAND ================
     report_parser = subparsers.add_parser('report', help='Report transactions')
@@ -527,20 +3468,32 @@ def main():
 
     # ======== REPORT TYPES: MONTHLY REPORTS =========
     monthly_parser =  report_subparsers.add_parser('monthly', help='Monthly Summary')
-    monthly_parser.add_argument('--month', type=int, choices=range(1,12), required=True, help='Month (1-12)')
+    monthly_parser.add_argument('--month', type=int, choices=range(1, 13), required=True, help='Month (1-12)')
     monthly_parser.add_argument('--year', type=int, required=True,  help='Year')
-    monthly_parser.set_defaults(func=tracker.generate_report)
+    monthly_parser.add_argument('--watch', type=float, nargs='?', const=WATCH_INTERVAL, metavar='SECONDS', help=f'Redraw whenever the ledger or the budgets change, checking every SECONDS (default: {WATCH_INTERVAL:g})')
+    monthly_parser.set_defaults(func=FinanceTracker.generate_report)
 
     # ======== REPORT TYPES: YEARLY REPORTS ==========
     yearly_parser =  report_subparsers.add_parser('yearly', help='Yearly Summary')
     yearly_parser.add_argument('--year',  required=True,  type=int, help='Year')
-    yearly_parser.set_defaults(func=tracker.generate_report)
+    yearly_parser.add_argument('--watch', type=float, nargs='?', const=WATCH_INTERVAL, metavar='SECONDS', help=f'Redraw whenever the ledger or the budgets change, checking every SECONDS (default: {WATCH_INTERVAL:g})')
+    yearly_parser.set_defaults(func=FinanceTracker.generate_report)
 
     # ======== REPORT TYPES: CATEGORY REPORTS ==========
     category_parser =  report_subparsers.add_parser('category', help='Summary by categories')
     category_parser.add_argument('--year',type=int, required=True, help='Year')
     category_parser.add_argument('--month', type=int, help='Month (1-12)')
-    category_parser.set_defaults(func=tracker.category_report)
+    category_parser.add_argument('--watch', type=float, nargs='?', const=WATCH_INTERVAL, metavar='SECONDS', help=f'Redraw whenever the ledger or the budgets change, checking every SECONDS (default: {WATCH_INTERVAL:g})')
+    category_parser.set_defaults(func=FinanceTracker.category_report)
+
+    # ========= REPORT TYPES: RANGE =========
+    range_parser = report_subparsers.add_parser('range', help='Summary of every year in a range')
+    range_parser.add_argument('--from-year', type=int, required=True, help='First year')
+    range_parser.add_argument('--to-year', type=int, required=True, help='Last year')
+    range_parser.add_argument('--monthly', action='store_true', help='Add the monthly breakdown of each year')
+    range_parser.add_argument('--workers', type=int, default=1, help='Processes for the scan (contiguous row slices, one per process) when the aggregates have to be rebuilt')
+    range_parser.add_argument('--watch', type=float, nargs='?', const=WATCH_INTERVAL, metavar='SECONDS', help=f'Redraw whenever the ledger or the budgets change, checking every SECONDS (default: {WATCH_INTERVAL:g})')
+    range_parser.set_defaults(func=FinanceTracker.range_report)
 
     # =============== BUDGET COMMAND =================
     budget_parser = subparsers.add_parser('budget', help='Set and track budgets')
@@ -551,35 +3504,73 @@ def main():
     set_parser.add_argument('--limit', type=float, required=True, help='Set a limit')
     set_parser.add_argument('--month', type=int, choices=range(1,13), required=True, help='Budget month. If the month entered is greater than the current month, the budget is set for that same month, next year')
     set_parser.add_argument('--category', type=str, required=True, help='Choose a category to budget')
-    set_parser.set_defaults(func=tracker.set_budget)
+    set_parser.set_defaults(func=FinanceTracker.set_budget)
 
     # ========= BUDGET ACTION: BUDGET STATUS =========
     set_parser = budget_subparser.add_parser('status', help='Set a budget')
     set_parser.add_argument('--category', type=str, help='Choose a category to track')
-    set_parser.add_argument('--start-date', type=str, help='Start date (YYYY-MM-DD)')
-    set_parser.add_argument('--end-date', type=str, help='End date (YYYY-MM-DD)')
+    set_parser.add_argument('--start-date', type=date_argument, help='Start date (YYYY-MM-DD)')
+    set_parser.add_argument('--end-date', type=date_argument, help='End date (YYYY-MM-DD)')
     set_parser.add_argument('--month', type=int, help='Filter by month (1-12)')
     set_parser.add_argument('--year', type=int, help='Filter by year')
-    set_parser.set_defaults(func=tracker.track_budget)
+    set_parser.add_argument('--watch', type=float, nargs='?', const=WATCH_INTERVAL, metavar='SECONDS', help=f'Redraw whenever the ledger or the budgets change, checking every SECONDS (default: {WATCH_INTERVAL:g})')
+    set_parser.set_defaults(func=FinanceTracker.track_budget)
+
+    # ======== BUDGET ACTION: BUDGET DASHBOARD ========
+    dashboard_parser = budget_subparser.add_parser('dashboard', help='Spending against every budget in a range, per category')
+    dashboard_parser.add_argument('--category', type=str, help='Only show this category')
+    dashboard_parser.add_argument('--start-date', type=date_argument, help='Start date (YYYY-MM-DD)')
+    dashboard_parser.add_argument('--end-date', type=date_argument, help='End date (YYYY-MM-DD)')
+    dashboard_parser.add_argument('--year', type=int, help='Every budget in this year')
+    dashboard_parser.add_argument('--watch', type=float, nargs='?', const=WATCH_INTERVAL, metavar='SECONDS', help=f'Redraw whenever the ledger or the budgets change, checking every SECONDS (default: {WATCH_INTERVAL:g})')
+    dashboard_parser.set_defaults(func=FinanceTracker.budget_dashboard)
 
     # =============== EXPORT COMMANDS ================
     export_parser = subparsers.add_parser('export', help='Export Document')
-    export_parser.add_argument('--format', choices=['json', 'csv'], required=True, help='Choose file type')
+    export_parser.add_argument('--format', choices=['json', 'csv', 'jsonl'], required=True, help='Choose file type')
     export_parser.add_argument('--category', type=str, help='Filter by category')
-    export_parser.add_argument('--type', choices=['expense', 'income'], help='Filter by type')
+    export_parser.add_argument('--type', choices=['expense', 'income', 'all'], default='all', help='Filter by type (default: all)')
+    export_parser.add_argument('--start-date', type=date_argument, help='Start date (YYYY-MM-DD)')
+    export_parser.add_argument('--end-date', type=date_argument, help='End date (YYYY-MM-DD)')
     export_parser.add_argument('--month', type=int, help='Filter by month (1-12)')
     export_parser.add_argument('--year', type=int, help='Filter by year')
+    export_parser.add_argument('--gzip', action='store_true', help='Compress the output with gzip')
+    export_parser.add_argument('--force', action='store_true', help='Overwrite the output file without asking')
     export_parser.add_argument('--file-name', type=str, required=True, help='File name')
     export_parser.add_argument('--file-path', type=str, help='File path')
-    export_parser.set_defaults(func=tracker.export_report)
+    export_parser.set_defaults(func=FinanceTracker.export_report)
 
+    # ================ SERVE COMMAND ================
+    serve_parser = subparsers.add_parser('serve', help='Keep the ledger in memory and serve other invocations over a local socket')
+    serve_parser.add_argument('--flush-interval', type=float, default=DAEMON_FLUSH_INTERVAL, help='Seconds between batched writes to disk')
 
-    args = parser.parse_args()
+    return parser
 
-    if hasattr(args, 'func'):
-        args.func(args)
+def main():
+
+    parser = build_parser()
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper(), format='[%(levelname)s] %(message)s')
+    TransactionColumns.engine = args.engine
+
+    if args.commands == 'serve':
+        serve(args, parser)
+
+    elif hasattr(args, 'func'):
+        # a watch stays in this process: the daemon answers one request at a time
+        if not args.no_daemon and not getattr(args, 'watch', None):
+            reply = forward(resolve_base_dir(args.data_dir) / DAEMON_SOCKET, sys.argv[1:])
+            if reply is not None:
+                print(reply['output'], end='')
+                sys.exit(reply['status'])
+
+        tracker = FinanceTracker(base_dir=args.data_dir, backend=args.backend, group_commit=args.group_commit, cache_size=args.cache_size)
+        if getattr(args, 'watch', None):
+            watch(tracker, args, sys.argv[1:])
+        else:
+            run_instrumented(tracker, args, sys.argv[1:])
     else:
         parser.print_help()
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()